@@ -38,7 +38,20 @@ else:
     print(f"Superuser '{username}' already exists.")
 EOF
 
-python manage.py rqworker default &
+# Ein eigener Worker für Thumbnails, damit sie nicht hinter langen Konvertierungen warten
+python manage.py rqworker thumbnails default &
+
+# Genau ein Worker löscht Dateien, damit viele Löschungen das Dateisystem nicht überlasten
+python manage.py rqworker deletes &
+
+# Mehrere Worker, damit mehrere Videos gleichzeitig konvertiert werden können.
+# Eine Konvertierung startet erst nach dem Thumbnail-Job ihres Videos, weil sie
+# das Original löscht; daher arbeiten diese Worker zuerst offene Thumbnails ab.
+i=0
+while [ "$i" -lt "${RQ_WORKER_COUNT:-1}" ]; do
+  python manage.py rqworker thumbnails hls default &
+  i=$((i + 1))
+done
 
 exec gunicorn core.wsgi:application --bind 0.0.0.0:8000 --timeout 300 # --reload Nur für die Entwicklungszeit
 
@@ -12,6 +12,26 @@ from django.db.models.signals import post_save
 from videoflix_app.models import Video
 from videoflix_app import signals
 
+# Name of the pytest-xdist worker running this session ('main' without
+# xdist); the temporary media directories carry it so that a worker only
+# ever removes its own.
+XDIST_WORKER = os.environ.get('PYTEST_XDIST_WORKER', 'main')
+
+
+def pytest_sessionfinish(session):
+    """
+    Remove the MEDIA_ROOT created by the test settings after the session.
+
+    core.test_settings creates the directory when it is imported, in every
+    xdist worker and in the controlling process. Tests that write to it are
+    cleaned up by cleanup_test_media, but the directory itself would be
+    left behind otherwise.
+    """
+    from django.conf import settings
+    media_root = settings.MEDIA_ROOT
+    if os.path.basename(os.path.normpath(media_root)).startswith('videoflix_test_'):
+        shutil.rmtree(media_root, ignore_errors=True)
+
 
 @pytest.fixture(scope='function')
 def temp_media_root():
@@ -21,26 +41,13 @@ def temp_media_root():
     This fixture creates a unique temporary directory for each test
     and automatically cleans it up after the test completes.
     """
-    temp_dir = tempfile.mkdtemp(prefix='videoflix_test_')
+    temp_dir = tempfile.mkdtemp(prefix=f'videoflix_test_{XDIST_WORKER}_')
     yield temp_dir
     # Cleanup after test
     if os.path.exists(temp_dir):
         shutil.rmtree(temp_dir, ignore_errors=True)
 
 
-@pytest.fixture(autouse=True)
-def enable_db_access_for_all_tests(db):
-    """
-    Allow database access for all tests automatically.
-    
-    This fixture is auto-used for all tests, providing database access
-    without needing to mark each test with @pytest.mark.django_db.
-    
-    Alternative: Remove this fixture and use @pytest.mark.django_db explicitly.
-    """
-    pass
-
-
 @pytest.fixture(autouse=True)
 def disable_video_signals():
     """
@@ -55,34 +62,36 @@ def disable_video_signals():
 
 
 @pytest.fixture(autouse=True)
-def cleanup_test_media():
+def ffmpeg_binaries(monkeypatch):
+    """
+    Provide fixed ffmpeg binary paths to the video tasks.
+
+    The tasks resolve ffmpeg/ffprobe once at import and skip their work if
+    they are not installed. Tests mock subprocess.run, so they should not
+    depend on whether the binaries exist on the machine running them.
+    """
+    monkeypatch.setattr('videoflix_app.tasks.FFMPEG', '/usr/bin/ffmpeg')
+    monkeypatch.setattr('videoflix_app.tasks.FFPROBE', '/usr/bin/ffprobe')
+
+
+@pytest.fixture(autouse=True)
+def cleanup_test_media(request, settings):
     """
     Automatically cleanup test media files after each test.
     
-    This fixture runs after every test and removes any test media files
-    that might have been created during testing.
+    This fixture runs after every test and removes the media directory the
+    test wrote to. Only temporary test directories are removed, never a
+    MEDIA_ROOT configured outside the tests. A media directory owned by the
+    test class (see TempMediaRootMixin) is kept for the class's remaining
+    tests and removed after its last one.
     """
     yield  # Run the test first
-    
-    # Cleanup paths that might contain test files
-    cleanup_paths = [
-        '/app/test_media',
-        '/app/media/test_videos',
-        '/tmp/videoflix_test_media_*',
-        '/tmp/videoflix_test_edge_cases_*'
-    ]
-    
-    for pattern in cleanup_paths:
-        if '*' in pattern:
-            # Handle glob patterns
-            import glob
-            for path in glob.glob(pattern):
-                if os.path.exists(path):
-                    shutil.rmtree(path, ignore_errors=True)
-        else:
-            # Handle direct paths
-            if os.path.exists(pattern):
-                shutil.rmtree(pattern, ignore_errors=True)
+
+    media_root = settings.MEDIA_ROOT
+    if media_root == getattr(request.cls, 'media_root', None):
+        return
+    if os.path.basename(os.path.normpath(media_root)).startswith('videoflix_test_'):
+        shutil.rmtree(media_root, ignore_errors=True)
 
 
 @pytest.fixture(scope='session')
@@ -98,6 +107,75 @@ def django_db_setup(django_db_setup, django_db_blocker):
         pass
 
 
+@pytest.fixture
+def existing_user(db):
+    """
+    Create a registered user for a test.
+
+    The user is created inside the test's transaction and rolled back with
+    it, so it never leaks into other tests. The MD5 hasher of the test
+    settings keeps creating it per test cheap.
+
+    Returns:
+        User: Django user instance with the email 'existing@example.com'
+    """
+    from django.contrib.auth.models import User
+    return User.objects.create_user(
+        username='existing@example.com',
+        email='existing@example.com',
+        password='password'
+    )
+
+
+@pytest.fixture
+def refresh_user(db):
+    """
+    Create an active user for the token refresh tests.
+
+    Returns:
+        User: Active Django user instance with the password 'password123'
+    """
+    from django.contrib.auth.models import User
+    return User.objects.create_user(
+        username='refreshtest@example.com',
+        email='refreshtest@example.com',
+        password='password123',
+        is_active=True
+    )
+
+
+@pytest.fixture
+def inactive_user(db):
+    """
+    Create a registered but not yet activated user.
+
+    Returns:
+        User: Inactive Django user instance awaiting account activation
+    """
+    from django.contrib.auth.models import User
+    return User.objects.create_user(
+        username='inactive@example.com',
+        email='inactive@example.com',
+        password='password',
+        is_active=False
+    )
+
+
+@pytest.fixture
+def valid_refresh_token(refresh_user):
+    """
+    Mint a refresh token for the refresh user.
+
+    The token is issued directly instead of through the login endpoint,
+    which skips the HTTP round-trip and the password check.
+
+    Returns:
+        str: An encoded, valid refresh token for `refresh_user`
+    """
+    from rest_framework_simplejwt.tokens import RefreshToken
+    return str(RefreshToken.for_user(refresh_user))
+
+
 @pytest.fixture
 def api_client():
     """
@@ -2,6 +2,8 @@
 ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+File responses are sent via the 'http.response.pathsend' extension where the
+server supports it (see core.handlers).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -9,8 +11,14 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+
+from core.handlers import PathSendASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+# Like get_asgi_application(), but lets servers that support the
+# 'http.response.pathsend' extension send file responses themselves.
+application = PathSendASGIHandler()
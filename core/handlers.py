@@ -0,0 +1,85 @@
+import os
+from contextvars import ContextVar
+
+from django.core.handlers.asgi import ASGIHandler
+from django.http import FileResponse
+
+PATHSEND_EXTENSION = 'http.response.pathsend'
+
+# Whether the ASGI server of the current request advertised the extension.
+_pathsend_supported = ContextVar('pathsend_supported', default=False)
+
+
+def _pathsend_path(response):
+    """
+    Returns the path a response can be sent from with 'http.response.pathsend'.
+
+    Only unmodified FileResponses for a file on disk that has not been read
+    yet qualify; wrapped content (e.g. gzip-compressed) is sent as usual.
+
+    Args:
+        response: The response about to be sent.
+
+    Returns:
+        str: The absolute path of the file, or None if the response cannot be
+            sent by path.
+    """
+    if not isinstance(response, FileResponse):
+        return None
+    file = getattr(response, 'file_to_stream', None)
+    path = getattr(file, 'name', None)
+    if not isinstance(path, str) or not os.path.isabs(path):
+        return None
+    try:
+        if file.tell() != 0:
+            return None
+    except (AttributeError, OSError):
+        return None
+    return path
+
+
+class PathSendASGIHandler(ASGIHandler):
+    """
+    ASGI handler that lets the server send file responses itself.
+
+    If the ASGI server supports the 'http.response.pathsend' extension, a
+    FileResponse is answered with the file's path instead of its content, and
+    the server transmits the file (typically with sendfile(2)) without the
+    bytes passing through Python. Other servers and responses are handled
+    exactly like Django's default ASGIHandler.
+    """
+
+    async def handle(self, scope, receive, send):
+        """
+        Records whether the server supports pathsend and handles the request.
+
+        The flag is kept in a context variable, which the tasks Django creates
+        for the request inherit.
+        """
+        token = _pathsend_supported.set(PATHSEND_EXTENSION in scope.get('extensions', {}))
+        try:
+            await super().handle(scope, receive, send)
+        finally:
+            _pathsend_supported.reset(token)
+
+    async def send_response(self, response, send):
+        """Sends the response by path if possible, otherwise as usual."""
+        path = _pathsend_path(response) if _pathsend_supported.get() else None
+        if path is None:
+            await super().send_response(response, send)
+            return
+
+        response_headers = [
+            (header.encode('ascii'), value.encode('latin1'))
+            for header, value in response.items()
+        ]
+        for cookie in response.cookies.values():
+            response_headers.append(
+                (b'Set-Cookie', cookie.output(header='').encode('ascii').strip())
+            )
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': response_headers,
+        })
+        await send({'type': PATHSEND_EXTENSION, 'path': path})
@@ -176,6 +176,13 @@ RQ_QUEUES = {
     },
 }
 
+# Thumbnails and HLS conversions get their own queues with the same Redis
+# connection, so quick thumbnail jobs are not stuck behind long conversions.
+# File cleanups of deleted videos run one at a time on the 'deletes' queue.
+RQ_QUEUES['thumbnails'] = {**RQ_QUEUES['default']}
+RQ_QUEUES['hls'] = {**RQ_QUEUES['default']}
+RQ_QUEUES['deletes'] = {**RQ_QUEUES['default']}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -217,6 +224,21 @@ STATIC_ROOT = BASE_DIR / "static"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Internal nginx location that maps to MEDIA_ROOT/videos/. If set, HLS playlists
+# and segments are handed to nginx via X-Accel-Redirect instead of being
+# streamed by Django. Leave empty to serve them from Django.
+HLS_ACCEL_REDIRECT_PREFIX = os.environ.get("HLS_ACCEL_REDIRECT_PREFIX", default="")
+
+# H.264 encoder used for the HLS conversion: libx264 (CPU), h264_nvenc
+# (NVIDIA), h264_qsv (Intel Quick Sync), h264_vaapi or auto (NVENC or VAAPI
+# if the worker host has the hardware). Falls back to libx264 if the
+# installed ffmpeg does not support the configured encoder.
+VIDEOFLIX_FFMPEG_VCODEC = os.environ.get("VIDEOFLIX_FFMPEG_VCODEC", default="libx264")
+
+# Threads per ffmpeg job (0 = all cores). Combine with RQ_WORKER_COUNT, e.g.
+# 4 threads and CPU count / 4 workers.
+VIDEOFLIX_FFMPEG_THREADS = int(os.environ.get("VIDEOFLIX_FFMPEG_THREADS", default=4))
+
 # STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 # Standard storage for development
 STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
@@ -237,6 +259,11 @@ REST_FRAMEWORK = {
         # 'rest_framework_simplejwt.authentication.JWTAuthentication',  
         'user_auth_app.api.authentication.CookieJWTAuthentication',      
     ],
+
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
@@ -270,6 +297,22 @@ SIMPLE_JWT = {
     'AUTH_REFRESH_COOKIE_SAMESITE': 'Lax',
 }
 
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'videoflix_app': {
+            'handlers': ['console'],
+            'level': os.environ.get("VIDEOFLIX_LOG_LEVEL", default="INFO"),
+        },
+    },
+}
+
 # Email backend for development (outputs emails to console)
 # EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 # In development mode (DEBUG=True) continue using console
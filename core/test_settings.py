@@ -20,9 +20,11 @@ CACHES = {
     }
 }
 
-# Media settings for tests
+# Media settings for tests. The directory is named after the pytest-xdist
+# worker, so that conftest's cleanup_test_media removes it after each test.
 import tempfile
-MEDIA_ROOT = tempfile.mkdtemp(prefix='videoflix_test_media_')
+MEDIA_ROOT = tempfile.mkdtemp(
+    prefix=f"videoflix_test_media_{os.environ.get('PYTEST_XDIST_WORKER', 'main')}_")
 
 # Auto-cleanup media files after tests
 TEST_MEDIA_CLEANUP = True
@@ -30,6 +32,11 @@ TEST_MEDIA_CLEANUP = True
 # Simplify password validation for tests
 AUTH_PASSWORD_VALIDATORS = []
 
+# Fast (insecure) password hashing for tests
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+]
+
 # RQ for tests - use Mock/Dummy
 RQ_QUEUES = {
     'default': {
@@ -40,6 +47,10 @@ RQ_QUEUES = {
     }
 }
 
+RQ_QUEUES['thumbnails'] = {**RQ_QUEUES['default']}
+RQ_QUEUES['hls'] = {**RQ_QUEUES['default']}
+RQ_QUEUES['deletes'] = {**RQ_QUEUES['default']}
+
 # Explicitly set secret key
 SECRET_KEY = 'test-secret-key-only-for-testing-12345'
 
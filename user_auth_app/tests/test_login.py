@@ -3,6 +3,8 @@ from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth.models import User
 
+LOGIN_URL = reverse('token_obtain_pair')
+
 
 class LoginTests(APITestCase):
     """
@@ -28,7 +30,7 @@ class LoginTests(APITestCase):
         self.user.is_active = True
         self.user.save()
 
-        self.login_url = reverse('token_obtain_pair')
+        self.login_url = LOGIN_URL
 
     def test_login_success(self):
         """
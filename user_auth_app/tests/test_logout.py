@@ -5,6 +5,8 @@ from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError
 
+LOGOUT_URL = reverse('logout')
+
 
 class LogoutViewTest(APITestCase):
     """
@@ -12,45 +14,38 @@ class LogoutViewTest(APITestCase):
     to cookie-based authentication and token blacklisting.
     """
 
-    def setUp(self):
+    @classmethod
+    def setUpTestData(cls):
         """
-        Set up the test environment before each test method is run.
+        Set up data shared by every test method in this class.
 
-        This method creates a standard, active test user and resolves the URLs
-        for the login and logout endpoints. These resources are reused across
-        multiple tests.
+        This method creates a standard, active test user and resolves the
+        logout URL. A single access/refresh token pair is minted directly for
+        the user, so the tests can authenticate without an HTTP login round-trip.
         """
-        self.user = User.objects.create_user(
+        cls.user = User.objects.create_user(
             username='testuser',
             email='test@example.com',
             password='testpassword123'
         )
-        self.user.is_active = True
-        self.user.save()
-
-        self.login_url = reverse('token_obtain_pair')
-        self.logout_url = reverse('logout')
+        cls.user.is_active = True
+        cls.user.save()
 
-    def _login_and_get_cookies(self):
-        """
-        A helper method to perform a login and set auth cookies on the test client.
+        refresh = RefreshToken.for_user(cls.user)
+        cls._access = str(refresh.access_token)
+        cls._refresh = str(refresh)
 
-        This simulates a user logging in via the API. The `APITestCase` client
-        automatically persists the cookies set in the response, making them
-        available for subsequent requests within the same test method.
+        cls.logout_url = LOGOUT_URL
 
-        Returns:
-            Response: The full response object from the login request.
+    def _auth(self):
         """
-        response = self.client.post(self.login_url, {
-            'email': 'test@example.com',
-            'password': 'testpassword123'
-        }, format='json')
+        A helper method to set the pre-generated auth cookies on the test client.
 
-        self.assertTrue('access_token' in self.client.cookies)
-        self.assertTrue('refresh_token' in self.client.cookies)
-
-        return response
+        This mirrors the cookies the login endpoint would set, without paying
+        for the password check and token signing on every test.
+        """
+        self.client.cookies['access_token'] = self._access
+        self.client.cookies['refresh_token'] = self._refresh
 
     def test_successful_logout(self):
         """
@@ -62,9 +57,7 @@ class LogoutViewTest(APITestCase):
         3. The server sends instructions to delete the access and refresh token cookies.
         4. The refresh token used for the session is successfully blacklisted.
         """
-        login_response = self._login_and_get_cookies()
-        self.assertEqual(login_response.status_code, status.HTTP_200_OK)
-        refresh_token_value = login_response.cookies.get('refresh_token').value
+        self._auth()
         logout_response = self.client.post(self.logout_url, {})
 
         self.assertEqual(logout_response.status_code, status.HTTP_200_OK)
@@ -77,7 +70,7 @@ class LogoutViewTest(APITestCase):
         self.assertEqual(logout_response.cookies['refresh_token']['max-age'], 0)
 
         with self.assertRaises(TokenError, msg="The refresh token should be invalid but was accepted."):
-            RefreshToken(refresh_token_value)
+            RefreshToken(self._refresh)
 
     def test_logout_without_authentication(self):
         """
@@ -100,7 +93,7 @@ class LogoutViewTest(APITestCase):
         refresh token to blacklist it. This test ensures the endpoint returns
         a 400 Bad Request if the refresh token is not provided.
         """
-        self._login_and_get_cookies()
+        self._auth()
         del self.client.cookies['refresh_token']
 
         response = self.client.post(self.logout_url, {})
@@ -116,7 +109,7 @@ class LogoutViewTest(APITestCase):
         An invalid access token should prevent access to the protected logout view,
         resulting in a 401 Unauthorized error with a 'token_not_valid' code.
         """
-        self._login_and_get_cookies()
+        self._auth()
         self.client.cookies['access_token'] = 'thisisnotavalidtoken'
 
         response = self.client.post(self.logout_url, {})
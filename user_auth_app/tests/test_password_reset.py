@@ -5,6 +5,8 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+PASSWORD_RESET_URL = reverse('password_reset_request')
+
 
 class PasswordResetRequestAPITest(APITestCase):
     """
@@ -29,8 +31,8 @@ class PasswordResetRequestAPITest(APITestCase):
             email='test@example.com',
             password='oldstrongpassword'
         )
-        self.url = reverse('password_reset_request')
-        self.password_reset_url = reverse('password_reset_request')
+        self.url = PASSWORD_RESET_URL
+        self.password_reset_url = PASSWORD_RESET_URL
 
     def test_password_reset_request_success(self):
         """
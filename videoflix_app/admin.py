@@ -1,8 +1,15 @@
 from django.contrib import admin
-from django.utils.html import format_html
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
 
 from .models import Video
 
+_THUMBNAIL_PREVIEW_HTML = (
+    '<a href="{0}" target="_blank">'
+    '<img src="{0}" style="max-height: 50px;" />'
+    '</a>'
+)
+
 # Register your models here.
 @admin.register(Video)
 class VideoAdmin(admin.ModelAdmin):
@@ -20,6 +27,9 @@ class VideoAdmin(admin.ModelAdmin):
     readonly_fields = ('thumbnail_preview',)
     list_filter = ('category',)
     search_fields = ('title', 'description')
+    list_per_page = 50
+    # Skip the extra unfiltered COUNT(*) query on large Video tables.
+    show_full_result_count = False
     fieldsets = (
         (None, {
             'fields': ('title', 'description', 'category', 'video_file')
@@ -29,7 +39,24 @@ class VideoAdmin(admin.ModelAdmin):
         }),
     )
 
-    readonly_fields = ('thumbnail_preview',)
+    def get_queryset(self, request):
+        """
+        Skips the potentially large 'description' column on the changelist.
+
+        Only that column is deferred, so columns added to the model later are
+        still loaded with the rows. The change form loads the full row.
+
+        Args:
+            request: The current admin request.
+
+        Returns:
+            QuerySet: The Video queryset used by the admin view.
+        """
+        queryset = super().get_queryset(request)
+        match = request.resolver_match
+        if match and match.url_name and match.url_name.endswith('_changelist'):
+            queryset = queryset.defer('description')
+        return queryset
 
     def thumbnail_preview(self, obj):
         """
@@ -45,12 +72,9 @@ class VideoAdmin(admin.ModelAdmin):
             str: An HTML string for the image tag or a default message.
         """
         if obj.thumbnail_url and hasattr(obj.thumbnail_url, 'url'):
-            return format_html(
-                '<a href="{0}" target="_blank">'
-                '<img src="{0}" style="max-height: 50px;" />'
-                '</a>',
-                obj.thumbnail_url.url
-            )
+            # The URL is escaped once and reused for both attributes.
+            url = escape(obj.thumbnail_url.url)
+            return mark_safe(_THUMBNAIL_PREVIEW_HTML.format(url))
         return "Wird nach dem Speichern generiert..."
 
     thumbnail_preview.short_description = 'Vorschau'
@@ -0,0 +1,13 @@
+from rest_framework.pagination import PageNumberPagination
+
+
+class VideoPagination(PageNumberPagination):
+    """
+    Page number pagination for the video list.
+
+    Pages hold 24 videos by default; clients can request up to 100 per page
+    with the 'page_size' query parameter.
+    """
+    page_size = 24
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -1,7 +1,50 @@
+from functools import lru_cache
+
 from rest_framework import serializers
-from django.urls import reverse
+from django.conf import settings
+from django.urls import get_script_prefix, get_urlconf, reverse
+
+from ..models import Video, HLS_RESOLUTIONS
+
+
+# Placeholders reversed into the playlist route; neither can occur in a real
+# URL, so replacing them cannot touch any other part of the path.
+_MOVIE_ID_SENTINEL = 987654321
+_RESOLUTION_SENTINEL = '__res__'
+
+
+@lru_cache(maxsize=None)
+def _hls_playlist_url_template_for(script_prefix, urlconf):
+    """
+    Returns the HLS playlist path for a script prefix and URLconf as a format string.
+
+    Args:
+        script_prefix (str): The script prefix the path is reversed under.
+        urlconf (str): The URLconf the route is resolved in.
 
-from ..models import Video
+    Returns:
+        str: A path like '/api/video/{movie_id}/{resolution}/index.m3u8'.
+    """
+    url = reverse('hls-playlist', urlconf=urlconf, kwargs={
+        'movie_id': _MOVIE_ID_SENTINEL, 'resolution': _RESOLUTION_SENTINEL})
+    url = url.replace('{', '{{').replace('}', '}}')
+    return (url.replace(str(_MOVIE_ID_SENTINEL), '{movie_id}', 1)
+               .replace(_RESOLUTION_SENTINEL, '{resolution}', 1))
+
+
+def _hls_playlist_url_template():
+    """
+    Returns the HLS playlist path as a format string.
+
+    The URL resolver is walked only once per script prefix and URLconf, with
+    sentinel values that are then replaced by '{movie_id}' and '{resolution}'
+    placeholders.
+
+    Returns:
+        str: A path like '/api/video/{movie_id}/{resolution}/index.m3u8'.
+    """
+    return _hls_playlist_url_template_for(
+        get_script_prefix(), get_urlconf() or settings.ROOT_URLCONF)
 
 
 class VideoSerializer(serializers.ModelSerializer):
@@ -30,7 +73,8 @@ class VideoSerializer(serializers.ModelSerializer):
         Returns the absolute URL of the video's thumbnail.
 
         If a thumbnail URL exists and a request context is available,
-        it constructs the absolute URL. Otherwise, it returns an empty string.
+        it constructs the absolute URL directly from the storage backend and
+        the stored file name. Otherwise, it returns an empty string.
 
         Args:
             obj: The Video object being serialized.
@@ -42,10 +86,11 @@ class VideoSerializer(serializers.ModelSerializer):
         if request is None:
             return None
 
-        if obj.thumbnail_url:
-            return request.build_absolute_uri(obj.thumbnail_url.url)
+        name = obj.thumbnail_url.name if obj.thumbnail_url else None
+        if not name:
+            return ""
 
-        return ""
+        return request.build_absolute_uri(obj.thumbnail_url.storage.url(name))
 
 
 class VideoDetailSerializer(VideoSerializer):
@@ -69,7 +114,8 @@ class VideoDetailSerializer(VideoSerializer):
         """
         Returns a dictionary of HLS URLs for different resolutions.
 
-        Constructs URLs for 480p, 720p, and 1080p resolutions.
+        Constructs URLs for 480p, 720p, and 1080p resolutions from a cached
+        URL template instead of reversing the route once per resolution.
 
         Args:
             obj: The Video object being serialized.
@@ -82,14 +128,11 @@ class VideoDetailSerializer(VideoSerializer):
         if not request:
             return None
 
-        urls = {}
-        resolutions = ['480p', '720p', '1080p']
+        template = _hls_playlist_url_template()
 
-        for res in resolutions:
-            relative_url = reverse(
-                'hls-playlist',
-                kwargs={'movie_id': obj.pk, 'resolution': res}
+        return {
+            res: request.build_absolute_uri(
+                template.format(movie_id=obj.pk, resolution=res)
             )
-            urls[res] = request.build_absolute_uri(relative_url)
-
-        return urls
+            for res in HLS_RESOLUTIONS
+        }
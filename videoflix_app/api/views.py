@@ -1,15 +1,213 @@
 import os, re
-from django.http import FileResponse, Http404
+from urllib.parse import quote
+from django.http import FileResponse, Http404, HttpResponse
 from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.gzip import gzip_page
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 
+from .pagination import VideoPagination
 from .serializers import VideoSerializer, VideoDetailSerializer
-from ..models import Video
+from ..models import Video, HLS_BASE_FILENAME_CACHE_KEY, HLS_RESOLUTIONS
 from user_auth_app.api.authentication import CookieJWTAuthentication
 
+HLS_BASE_FILENAME_TIMEOUT = 3600
+# Segments never change once written; finished playlists rarely do.
+HLS_SEGMENT_MAX_AGE = 60 * 60 * 24 * 365
+HLS_PLAYLIST_MAX_AGE = 60
+
+# Segment filenames as written by ffmpeg ('%03d.ts'); \A/\Z also reject a trailing newline.
+_SEGMENT_RE = re.compile(r'\A\d+\.ts\Z')
+_BYTE_RANGE_RE = re.compile(r'\Abytes=(\d*)-(\d*)\Z')
+
+
+def _get_base_filename(movie_id):
+    """
+    Returns the base filename of a video's upload, used to locate its HLS files.
+
+    The value is read from the stored `base_filename` column and cached per
+    primary key so that playlist and segment requests during playback do not
+    hit the database. Rows written without Video.save() (bulk_create, update)
+    have no stored name; for them it is derived from the upload's name, like
+    the conversion does. The cache entry is dropped by the Video post_save and
+    post_delete signal handlers.
+
+    Args:
+        movie_id (int): The primary key of the video.
+
+    Returns:
+        str: The upload's filename without directory and extension.
+
+    Raises:
+        Http404: If no video with the given primary key exists, or it has no
+            upload. Nothing is cached in that case.
+    """
+    def load():
+        video = get_object_or_404(
+            Video.objects.only('base_filename', 'video_file'), pk=movie_id)
+        base_filename = (video.base_filename
+                         or os.path.splitext(os.path.basename(video.video_file.name))[0])
+        if not base_filename:
+            raise Http404
+        return base_filename
+
+    return cache.get_or_set(
+        HLS_BASE_FILENAME_CACHE_KEY.format(movie_id), load, HLS_BASE_FILENAME_TIMEOUT
+    )
+
+
+def _parse_byte_range(range_header, size):
+    """
+    Parses a single-range HTTP 'Range' header against a file size.
+
+    Args:
+        range_header (str): The value of the request's Range header.
+        size (int): The size of the requested file in bytes.
+
+    Returns:
+        tuple: The inclusive (start, end) byte positions, or None if the header
+            is malformed or asks for multiple ranges and should be ignored.
+
+    Raises:
+        ValueError: If the range cannot be satisfied for a file of this size.
+    """
+    match = _BYTE_RANGE_RE.match(range_header.strip())
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = int(last) if last else size - 1
+        if last and end < start:
+            return None
+    elif last:
+        suffix_length = int(last)
+        if suffix_length == 0:
+            raise ValueError('Empty suffix range.')
+        start = max(size - suffix_length, 0)
+        end = size - 1
+    else:
+        return None
+
+    if start >= size:
+        raise ValueError('Range starts beyond the end of the file.')
+    return start, min(end, size - 1)
+
+
+def _byte_range_response(file, range_header, content_type):
+    """
+    Builds a partial response for a single byte range of an open file.
+
+    Args:
+        file: The open binary file to read from.
+        range_header (str): The value of the request's Range header.
+        content_type (str): The MIME type to send with the bytes.
+
+    Returns:
+        HttpResponse: A 206 response with the requested bytes, a 416 response if
+            the range cannot be satisfied, or None if the header is ignored and
+            the whole file should be sent.
+    """
+    size = os.fstat(file.fileno()).st_size
+    try:
+        byte_range = _parse_byte_range(range_header, size)
+    except ValueError:
+        response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range is None:
+        return None
+
+    start, end = byte_range
+    file.seek(start)
+    response = HttpResponse(
+        file.read(end - start + 1), status=status.HTTP_206_PARTIAL_CONTENT,
+        content_type=content_type)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def _hls_file_response(request, base_filename, resolution, filename, content_type,
+                       byte_ranges=False):
+    """
+    Builds the response that delivers a file from a video's HLS directory.
+
+    If `HLS_ACCEL_REDIRECT_PREFIX` is configured, the file is not read by
+    Django at all: an empty response with an `X-Accel-Redirect` header is
+    returned and the reverse proxy (nginx) sends the file from an internal
+    location mapped to `MEDIA_ROOT/videos/`. Otherwise the file is streamed
+    with a FileResponse. If `byte_ranges` is set, a single byte range
+    requested via the 'Range' header is answered with 206 Partial Content.
+
+    Args:
+        request: The current request.
+        base_filename (str): The base filename of the video's upload.
+        resolution (str): The resolution directory (e.g., '720p').
+        filename (str): The file inside the resolution directory.
+        content_type (str): The MIME type to send with the file.
+        byte_ranges (bool): Whether to answer Range requests. Must stay off for
+            responses that may be compressed, whose byte positions would not
+            match the Content-Range header.
+
+    Returns:
+        HttpResponse: The redirect or streaming response.
+
+    Raises:
+        Http404: If the file is served by Django and does not exist.
+    """
+    accel_prefix = getattr(settings, 'HLS_ACCEL_REDIRECT_PREFIX', '')
+    if accel_prefix:
+        response = HttpResponse(content_type=content_type)
+        # Upload names may be non-ASCII; nginx expects the URI percent-encoded.
+        response['X-Accel-Redirect'] = (
+            f"{accel_prefix.rstrip('/')}/{quote(base_filename)}/{resolution}/{filename}"
+        )
+        return response
+
+    file_path = os.path.join(
+        settings.MEDIA_ROOT,
+        'videos',
+        base_filename,
+        resolution,
+        filename
+    )
+    # Opening directly instead of checking os.path.exists() first saves a stat
+    # per request and leaves no gap in which the file could disappear.
+    try:
+        file = open(file_path, 'rb')
+    except OSError:
+        raise Http404
+
+    # Until a response owns the file it must be closed here, so a failure
+    # cannot leak the descriptor.
+    range_header = request.headers.get('Range') if byte_ranges else None
+    if range_header:
+        try:
+            response = _byte_range_response(file, range_header, content_type)
+        except Exception:
+            file.close()
+            raise
+        if response is not None:
+            file.close()
+            return response
+
+    try:
+        response = FileResponse(file, content_type=content_type)
+    except Exception:
+        file.close()
+        raise
+    if byte_ranges:
+        response['Accept-Ranges'] = 'bytes'
+    return response
 
 class VideoListView(APIView):
     """
@@ -19,16 +217,33 @@ class VideoListView(APIView):
     """
     authentication_classes = [CookieJWTAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = VideoPagination
 
     def get(self, request):
         """
-        Handles GET requests to list all videos.
+        Handles GET requests to list all videos, newest first.
+
+        Only the columns the serializer needs are loaded. If the request has a
+        'page' query parameter, the list is paginated and wrapped in the
+        paginator's envelope; otherwise the plain list is returned as before.
 
         Returns:
             Response: A DRF Response object containing the serialized video data.
         """
-        videos = Video.objects.all()
-        serializer = VideoSerializer(videos, many=True, context={'request': request})
+        # The id breaks ties between videos saved at the same time, so pages
+        # never overlap or skip a video.
+        videos = Video.objects.only(*VideoSerializer.Meta.fields).order_by('-created_at', '-id')
+
+        if 'page' in request.query_params:
+            paginator = self.pagination_class()
+            page = paginator.paginate_queryset(videos, request, view=self)
+            serializer = VideoSerializer(page, many=True, context={'request': request})
+            return paginator.get_paginated_response(serializer.data)
+
+        # Without pagination, stream rows from the database in chunks rather
+        # than caching the whole result set on the queryset.
+        serializer = VideoSerializer(
+            videos.iterator(chunk_size=500), many=True, context={'request': request})
 
         return Response(serializer.data)
 
@@ -52,55 +267,48 @@ class VideoDetailView(APIView):
         Returns:
             Response: A DRF Response with the video's details or a 404 error.
         """
-        try:
-            video = Video.objects.get(pk=pk)
-            serializer = VideoDetailSerializer(video, context={'request': request})
-            return Response(serializer.data)
-        except Video.DoesNotExist:
+        video = Video.objects.filter(pk=pk).first()
+        if video is None:
             return Response({'error': 'Video not found'}, status=status.HTTP_404_NOT_FOUND)
-        
+        serializer = VideoDetailSerializer(video, context={'request': request})
+        return Response(serializer.data)
+
 
 class HLSPlaylistView(APIView):
     """
     API view to serve the HLS playlist file (.m3u8) for a video.
 
     This view constructs the path to the playlist file based on the video ID
-    and the requested resolution.
+    and the requested resolution. Only the converted resolutions are accepted,
+    so no request can point outside the video's HLS directory.
     """
     authentication_classes = [CookieJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
+    @method_decorator(gzip_page)
     def get(self, request, movie_id, resolution):
         """
         Handles GET requests for an HLS playlist.
 
+        The playlist is gzip-compressed for clients that accept it and may be
+        cached by the client for a short time.
+
         Args:
             movie_id (int): The primary key of the video.
             resolution (str): The requested resolution (e.g., '1080p').
 
         Returns:
-            FileResponse: A response streaming the .m3u8 file, or a 404 error.
+            HttpResponse: A response delivering the .m3u8 file, or a 404 error.
         """
-        try:
-            video = Video.objects.get(pk=movie_id)
-            base_filename = os.path.splitext(os.path.basename(video.video_file.name))[0]
-            playlist_path = os.path.join(
-                settings.MEDIA_ROOT,
-                'videos',
-                base_filename,
-                resolution,
-                'index.m3u8'
-            )
-
-            if os.path.exists(playlist_path):
-                response = FileResponse(open(playlist_path, 'rb'),
-                                        content_type='application/vnd.apple.mpegurl')
-                return response
-            else:
-                raise Http404
-
-        except Video.DoesNotExist:
-            raise Http404
+        if resolution not in HLS_RESOLUTIONS:
+            raise Http404("Unknown resolution.")
+
+        base_filename = _get_base_filename(movie_id)
+        response = _hls_file_response(
+            request, base_filename, resolution, 'index.m3u8', 'application/vnd.apple.mpegurl'
+        )
+        patch_cache_control(response, private=True, max_age=HLS_PLAYLIST_MAX_AGE)
+        return response
 
 
 class HLSSegmentView(APIView):
@@ -108,7 +316,8 @@ class HLSSegmentView(APIView):
     API view to serve an HLS video segment file (.ts).
 
     This view constructs the path to a specific segment file based on the
-    video ID, resolution, and segment name.
+    video ID, resolution, and segment name. Both the resolution and the
+    segment name are validated before they are joined into the path.
     """
     authentication_classes = [CookieJWTAuthentication]
     permission_classes = [IsAuthenticated]
@@ -117,33 +326,24 @@ class HLSSegmentView(APIView):
         """
         Handles GET requests for an HLS video segment.
 
+        Segments are immutable, so the client may cache them for a year.
+
         Args:
             movie_id (int): The primary key of the video.
             resolution (str): The resolution of the segment.
             segment (str): The name of the segment file (e.g., '0001.ts').
 
         Returns:
-            FileResponse: A response streaming the .ts file, or a 404 error.
+            HttpResponse: A response delivering the .ts file, or a 404 error.
         """
-        if not re.match(r'\d+\.ts$', segment):
+        if resolution not in HLS_RESOLUTIONS:
+            raise Http404("Unknown resolution.")
+        if not _SEGMENT_RE.match(segment):
             raise Http404("Invalid segment format.")
 
-        try:
-            video = Video.objects.get(pk=movie_id)
-            base_filename = os.path.splitext(os.path.basename(video.video_file.name))[0]
-            segment_path = os.path.join(
-                settings.MEDIA_ROOT,
-                'videos',
-                base_filename,
-                resolution,
-                segment
-            )
-
-            if os.path.exists(segment_path):
-                response = FileResponse(open(segment_path, 'rb'), content_type='video/MP2T')
-                return response
-            else:
-                raise Http404
-
-        except Video.DoesNotExist:
-            raise Http404
+        base_filename = _get_base_filename(movie_id)
+        response = _hls_file_response(
+            request, base_filename, resolution, segment, 'video/MP2T', byte_ranges=True)
+        patch_cache_control(
+            response, private=True, max_age=HLS_SEGMENT_MAX_AGE, immutable=True)
+        return response
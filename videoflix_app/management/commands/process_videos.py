@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from videoflix_app.models import Video
+from videoflix_app.signals import enqueue_videos
+
+
+class Command(BaseCommand):
+    """
+    Enqueues thumbnail generation and HLS conversion for existing videos.
+
+    Useful after a bulk import or to re-process videos whose conversion
+    failed. The thumbnails of all videos are generated by one job; each
+    conversion starts once that job has finished.
+    """
+    help = 'Enqueue thumbnail generation and HLS conversion for existing videos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('video_ids', nargs='*', type=int,
+                            help='Primary keys of the videos to process.')
+        parser.add_argument('--all', action='store_true',
+                            help='Process every video in the database.')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            video_ids = list(Video.objects.values_list('pk', flat=True))
+        elif options['video_ids']:
+            video_ids = list(Video.objects.filter(
+                pk__in=options['video_ids']).values_list('pk', flat=True))
+        else:
+            raise CommandError('Pass one or more video IDs or --all.')
+
+        enqueue_videos(video_ids)
+        self.stdout.write(self.style.SUCCESS(f'Enqueued processing for {len(video_ids)} video(s).'))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-15 22:26
+
+import os
+
+from django.db import migrations, models
+
+
+def populate_base_filename(apps, schema_editor):
+    """Derives base_filename for videos uploaded before the field existed."""
+    Video = apps.get_model('videoflix_app', 'Video')
+    for video in Video.objects.only('video_file').iterator():
+        video.base_filename = os.path.splitext(os.path.basename(video.video_file.name))[0]
+        video.save(update_fields=['base_filename'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videoflix_app', '0002_video_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='base_filename',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(populate_base_filename, migrations.RunPython.noop),
+    ]
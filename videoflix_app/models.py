@@ -1,7 +1,15 @@
+import os
+
 from django.db import models
 
 # Create your models here.
 
+# Resolutions every video is converted to; each has its own HLS directory.
+HLS_RESOLUTIONS = ('480p', '720p', '1080p')
+
+# Cache key under which the HLS views memoize a video's base filename.
+HLS_BASE_FILENAME_CACHE_KEY = 'hls:base:{}'
+
 
 class Video(models.Model):
     """
@@ -16,6 +24,33 @@ class Video(models.Model):
     thumbnail_url = models.FileField(upload_to='thumbnails/', blank=True, null=True)
     video_file = models.FileField(upload_to='videos/')
     category = models.CharField(max_length=100)
+    # Name of the upload without directory and extension; names the HLS directory.
+    base_filename = models.CharField(max_length=255, blank=True, editable=False)
+
+    class Meta:
+        """
+        Indexes for the newest-first video list, optionally filtered by category.
+        """
+        indexes = [
+            models.Index(fields=['-created_at'], name='video_created_at_idx'),
+            models.Index(fields=['category', '-created_at'], name='video_category_created_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the video and keeps `base_filename` in sync with `video_file`.
+
+        A new upload is written to storage before the row is saved, so that
+        `base_filename` is derived from the final name the storage assigned
+        (which may differ from the uploaded name if it was already taken).
+        """
+        if self.video_file and not self.video_file._committed:
+            self.video_file.save(self.video_file.name, self.video_file.file, save=False)
+        self.base_filename = (
+            os.path.splitext(os.path.basename(self.video_file.name))[0]
+            if self.video_file else ''
+        )
+        super().save(*args, **kwargs)
 
     def __str__(self):
         """
@@ -1,8 +1,83 @@
-import os, django_rq, shutil
+import logging, os, threading, django_rq
+from django.core.cache import cache
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from rq import Queue
+from rq.job import Dependency
 
-from .models import Video
+from .models import Video, HLS_BASE_FILENAME_CACHE_KEY
+
+logger = logging.getLogger(__name__)
+
+# Videos created in the current thread whose processing has not been
+# enqueued yet; see buffer_video_processing().
+_pending = threading.local()
+
+
+def enqueue_videos(video_ids):
+    """
+    Enqueues thumbnail generation and HLS conversion for several videos.
+
+    The HLS jobs depend on the thumbnail job: a successful conversion deletes
+    the original upload, which the thumbnail is rendered from. They are
+    started once the thumbnail job has finished, even if it failed.
+
+    Args:
+        video_ids (iterable): The primary keys of the videos to process.
+    """
+    video_ids = list(video_ids)
+    if not video_ids:
+        return
+    if len(video_ids) == 1:
+        thumbnail_job = Queue.prepare_data(
+            'videoflix_app.tasks.generate_thumbnail', args=(video_ids[0],))
+    else:
+        # Several thumbnails are stored with a single commit.
+        thumbnail_job = Queue.prepare_data(
+            'videoflix_app.tasks.generate_thumbnails_batch', args=(video_ids,))
+
+    # Thumbnails and conversions use separate queues, so quick thumbnail jobs
+    # are not stuck behind long conversions.
+    thumbnail = django_rq.get_queue('thumbnails').enqueue_many([thumbnail_job])[0]
+    after_thumbnail = Dependency(jobs=[thumbnail.id], allow_failure=True)
+    # The thumbnail job is enqueued first: RQ resolves the dependencies while
+    # enqueueing, so they cannot share one pipeline with the job they wait for.
+    django_rq.get_queue('hls').enqueue_many([
+        Queue.prepare_data('videoflix_app.tasks.convert_video_to_hls', args=(video_id,),
+                           depends_on=after_thumbnail)
+        for video_id in video_ids
+    ])
+
+
+def buffer_video_processing(video_id):
+    """
+    Schedules the processing of a video for when the transaction commits.
+
+    The video is added to a per-thread buffer that is flushed by the first
+    commit callback, so all videos created in one transaction (e.g. a bulk
+    import) are enqueued together, with one thumbnail job for all of them.
+
+    Args:
+        video_id (int): The primary key of the video to process.
+    """
+    if not hasattr(_pending, 'video_ids'):
+        _pending.video_ids = []
+    _pending.video_ids.append(video_id)
+    transaction.on_commit(flush_video_processing)
+
+
+def flush_video_processing():
+    """
+    Enqueues the processing of all buffered videos.
+
+    Videos from a rolled back transaction are left in the buffer, so only
+    those that still exist are enqueued.
+    """
+    video_ids = getattr(_pending, 'video_ids', [])
+    _pending.video_ids = []
+    if video_ids:
+        enqueue_videos(Video.objects.filter(pk__in=video_ids).values_list('pk', flat=True))
 
 
 @receiver(post_save, sender=Video)
@@ -11,7 +86,10 @@ def video_post_save(sender, instance, created, **kwargs):
     Signal handler that runs after a Video instance is saved.
 
     If a new video is created, this function enqueues background tasks
-    to generate its thumbnail and convert it to HLS format.
+    to generate its thumbnail and convert it to HLS format once the
+    surrounding transaction has been committed. On every save the
+    cached HLS base filename of the video is dropped, since the video file
+    may have been replaced.
 
     Args:
         sender: The model class that sent the signal (Video).
@@ -19,13 +97,14 @@ def video_post_save(sender, instance, created, **kwargs):
         created (bool): True if a new record was created.
         **kwargs: Wildcard keyword arguments.
     """
-    if created:
-        queue = django_rq.get_queue('default')
-        print(f"New video '{instance.title}': thumbnail creation is enqueued.")
-        queue.enqueue('videoflix_app.tasks.generate_thumbnail', instance.pk)
+    cache.delete(HLS_BASE_FILENAME_CACHE_KEY.format(instance.pk))
 
-        print(f"New video '{instance.title}': HLS conversion is enqueued.")
-        queue.enqueue('videoflix_app.tasks.convert_video_to_hls', instance.pk)
+    if created:
+        logger.info("New video '%s': thumbnail creation and HLS conversion are enqueued.",
+                    instance.title)
+        # Enqueue only once the row is committed, so a worker never picks up a
+        # job for a video it cannot see yet.
+        buffer_video_processing(instance.pk)
 
 
 @receiver(post_delete, sender=Video)
@@ -33,47 +112,49 @@ def video_post_delete(sender, instance, **kwargs):
     """
     Signal handler that runs after a Video instance is deleted.
 
-    This function cleans up all associated files from the filesystem to
-    prevent orphaned files. This includes the thumbnail, the original
-    video file, and the entire directory of HLS stream files.
+    This function schedules the cleanup of all associated files to prevent
+    orphaned files. This includes the thumbnail, the original video file,
+    and the entire directory of HLS stream files. The files are deleted by
+    a background task once the deletion has been committed, so the request
+    does not wait for a large HLS directory to be removed.
 
     Args:
         sender: The model class that sent the signal (Video).
         instance: The actual instance of the model being deleted.
         **kwargs: Wildcard keyword arguments.
     """
-    print(f"Delete all related files for: {instance.title}")
-
-    # --- 1. Delete the thumbnail file ---
-    if instance.thumbnail_url and hasattr(instance.thumbnail_url, 'path'):
-        if os.path.isfile(instance.thumbnail_url.path):
-            try:
-                os.remove(instance.thumbnail_url.path)
-                print(f"  -> Deleted: {instance.thumbnail_url.path}")
-            except OSError as e:
-                print(f"  -> Error when deleting {instance.thumbnail_url.path}: {e}")
-
-    # --- 2. Delete the video files and HLS directory ---
-    if instance.video_file and hasattr(instance.video_file, 'path'):
+    cache.delete(HLS_BASE_FILENAME_CACHE_KEY.format(instance.pk))
+
+    # The instance may come from a queryset with deferred fields (e.g. the
+    # admin changelist). The row is already gone, so reading a deferred
+    # field would fail with Video.DoesNotExist instead of loading it.
+    deferred = instance.get_deferred_fields()
+    logger.info("Delete all related files for: %s",
+                instance.pk if 'title' in deferred else instance.title)
+
+    file_paths = []
+    hls_dir = None
+
+    # --- 1. The thumbnail file ---
+    if ('thumbnail_url' not in deferred and instance.thumbnail_url
+            and hasattr(instance.thumbnail_url, 'path')):
+        file_paths.append(instance.thumbnail_url.path)
+
+    # --- 2. The original video file and the HLS directory ---
+    if ('video_file' not in deferred and instance.video_file
+            and hasattr(instance.video_file, 'path')):
         original_path = instance.video_file.path
+        file_paths.append(original_path)
+
+        # Construct the path to the main directory containing HLS files. The
+        # name is stored on the row; it is only derived from the path for
+        # rows that were not written through Video.save() or that were
+        # loaded without it.
+        stored_name = '' if 'base_filename' in deferred else instance.base_filename
+        base_filename = stored_name or os.path.splitext(os.path.basename(original_path))[0]
+        hls_dir = os.path.join(os.path.dirname(original_path), base_filename)
 
-        # Delete the original uploaded video file.
-        if os.path.isfile(original_path):
-            try:
-                os.remove(original_path)
-                print(f"  -> Deleted (original): {original_path}")
-            except OSError as e:
-                print(f"  -> Error when deleting {original_path}: {e}")
-
-        # Construct the path to the main directory containing HLS files.
-        base_filename = os.path.splitext(os.path.basename(original_path))[0]
-        video_dir = os.path.dirname(original_path)
-        main_video_dir_to_delete = os.path.join(video_dir, base_filename)
-
-        # Recursively delete the HLS directory and all its contents.
-        if os.path.isdir(main_video_dir_to_delete):
-            try:
-                shutil.rmtree(main_video_dir_to_delete)
-                print(f"  -> Directory deleted: {main_video_dir_to_delete}")
-            except OSError as e:
-                print(f"  -> Error when deleting {main_video_dir_to_delete}: {e}")
+    # The 'deletes' queue has a single worker, so a bulk delete removes one
+    # HLS directory at a time instead of flooding the filesystem.
+    transaction.on_commit(lambda: django_rq.get_queue('deletes').enqueue(
+        'videoflix_app.tasks.cleanup_video_files', file_paths, hls_dir))
@@ -1,11 +1,77 @@
+import functools
+import json
+import logging
 import subprocess
-import shlex
+import shutil
 import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 from django.conf import settings
+from django.db import transaction
 
 from .models import Video
 
+logger = logging.getLogger(__name__)
+
+# Absolute paths of the ffmpeg binaries, resolved once per worker process.
+# None if the binary is not installed.
+FFMPEG = shutil.which('ffmpeg')
+FFPROBE = shutil.which('ffprobe')
+
+# Frame size of each HLS rendition, keyed by its directory name.
+HLS_SIZES = {
+    '480p': (854, 480),
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+}
+
+# Extracts one frame (-vframes 1) from the 1-second mark (-ss) as the thumbnail.
+# Seeking on the input jumps to the nearest keyframe instead of decoding every
+# frame up to the mark.
+THUMBNAIL_SEEK_ARGS = ('-ss', '00:00:01.000')
+THUMBNAIL_ARGS = ('-vframes', '1')
+
+# Only errors are written to stderr, without the version banner or progress
+# lines. These are global options, which ffmpeg accepts anywhere in the argv.
+FFMPEG_LOG_ARGS = ('-hide_banner', '-loglevel', 'error')
+
+# Containers that store the codec parameters of every stream in their header.
+# For these, ffmpeg does not need to read and decode the start of the input
+# to find them; raw streams such as MPEG-TS still need the full probe.
+HEADER_CONTAINERS = frozenset({'.mp4', '.m4v', '.mov', '.mkv', '.webm'})
+FAST_PROBE_ARGS = ('-probesize', '32', '-analyzeduration', '0', '-fpsprobesize', '0')
+
+# 10-second segments, numbered from 0, all listed in a VOD playlist.
+HLS_MUXER_ARGS = ('-f', 'hls', '-hls_time', '10', '-hls_list_size', '0', '-start_number', '0')
+
+# Render device used by the VAAPI encoder.
+VAAPI_DEVICE = '/dev/dri/renderD128'
+
+# ffmpeg arguments per supported H.264 encoder: 'input' goes before '-i',
+# 'filter' is applied to every scaled rendition and 'output' selects the encoder.
+VIDEO_ENCODERS = {
+    'libx264': {
+        'input': [], 'filter': '',
+        'output': ['-c:v', 'libx264', '-crf', '23'],
+    },
+    'h264_nvenc': {
+        'input': [], 'filter': '',
+        'output': ['-c:v', 'h264_nvenc', '-preset', 'p5', '-rc', 'vbr', '-cq', '23'],
+    },
+    'h264_qsv': {
+        'input': [], 'filter': '',
+        'output': ['-c:v', 'h264_qsv', '-global_quality', '23'],
+    },
+    'h264_vaapi': {
+        'input': ['-vaapi_device', VAAPI_DEVICE], 'filter': 'format=nv12,hwupload',
+        'output': ['-c:v', 'h264_vaapi', '-qp', '23'],
+    },
+}
+
+# Number of threads unlinking HLS segments in parallel when a video is deleted.
+HLS_DELETE_WORKERS = 16
+
 
 def generate_thumbnail(video_id):
     """
@@ -17,17 +83,59 @@ def generate_thumbnail(video_id):
     Args:
         video_id (int): The primary key of the Video object.
     """
-    try:
-        video = Video.objects.get(pk=video_id)
-        # Optimization: If a thumbnail already exists, do nothing.
-        if video.thumbnail_url and video.thumbnail_url.name:
-            print(f"Thumbnail for Video ID {video_id} already exists.")
-            return
-    except Video.DoesNotExist:
-        print(f"ERROR: Video with ID {video_id} not found for thumbnail generation.")
+    if FFMPEG is None:
+        logger.error("'ffmpeg' command not found. Is it installed?")
         return
+    relative_path = _render_thumbnail(video_id)
+    if relative_path:
+        # A single UPDATE that does not go through save() and its signals.
+        Video.objects.filter(pk=video_id).update(thumbnail_url=relative_path)
+
+
+def generate_thumbnails_batch(video_ids):
+    """
+    Generates the thumbnails of several videos and stores them in one commit.
+
+    This function is intended to be run as a background task for bulk
+    uploads. All thumbnails are rendered first; their paths are then
+    written in a single transaction instead of one commit per video.
+
+    Args:
+        video_ids (list): The primary keys of the Video objects.
+    """
+    if FFMPEG is None:
+        logger.error("'ffmpeg' command not found. Is it installed?")
+        return
+    thumbnails = {video_id: _render_thumbnail(video_id) for video_id in video_ids}
+    with transaction.atomic():
+        for video_id, relative_path in thumbnails.items():
+            if relative_path:
+                Video.objects.filter(pk=video_id).update(thumbnail_url=relative_path)
+
+
+def _render_thumbnail(video_id):
+    """
+    Renders the thumbnail of a video into MEDIA_ROOT/thumbnails.
 
-    source_path = video.video_file.path
+    Args:
+        video_id (int): The primary key of the Video object.
+
+    Returns:
+        str: The path of the new thumbnail relative to MEDIA_ROOT, or None if
+            the video does not exist, already has a thumbnail or ffmpeg failed.
+    """
+    # Only the stored file names are needed, not a full model instance.
+    row = Video.objects.filter(pk=video_id).values_list('video_file', 'thumbnail_url').first()
+    if row is None:
+        logger.error("Video with ID %s not found for thumbnail generation.", video_id)
+        return None
+    video_file_name, thumbnail_name = row
+    # Optimization: If a thumbnail already exists, do nothing.
+    if thumbnail_name:
+        logger.info("Thumbnail for Video ID %s already exists.", video_id)
+        return None
+
+    source_path = _video_file_path(video_file_name)
 
     # Ensure the target directory exists.
     thumbnail_dir = os.path.join(settings.MEDIA_ROOT, 'thumbnails')
@@ -37,118 +145,544 @@ def generate_thumbnail(video_id):
     filename = os.path.splitext(os.path.basename(source_path))[0]
     target_path = os.path.join(thumbnail_dir, f"{filename}.jpg")
 
-    # Command to extract one frame (-vframes 1) from the 1-second mark (-ss).
-    cmd_string = f'ffmpeg -i "{source_path}" -ss 00:00:01.000 -vframes 1 "{target_path}"'
-    # Use shlex.split to safely parse the command string for subprocess.
-    cmd_list = shlex.split(cmd_string)
+    cmd_list = [FFMPEG, *_probe_args(source_path), *THUMBNAIL_SEEK_ARGS, '-i', source_path,
+                *THUMBNAIL_ARGS, *FFMPEG_LOG_ARGS, *_thread_args(), target_path]
 
     try:
         # Run the ffmpeg command. check=True raises an error on failure.
-        subprocess.run(cmd_list, check=True, capture_output=True, text=True)
-        print(f"  -> Successfully created thumbnail: {target_path}")
-
-        # Save the relative path of the new thumbnail to the Video model.
-        relative_path = os.path.relpath(target_path, settings.MEDIA_ROOT)
-        video.thumbnail_url.name = relative_path
-        # Use update_fields for an efficient database update.
-        video.save(update_fields=['thumbnail_url'])
-
-    except FileNotFoundError:
-        print("ERROR in worker: 'ffmpeg' command not found. Is it installed?")
+        subprocess.run(cmd_list, check=True, stdin=subprocess.DEVNULL,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        logger.info("Successfully created thumbnail: %s", target_path)
     except subprocess.CalledProcessError as e:
-        print(f"  -> ERROR creating thumbnail: {e.stderr.strip()}")
+        logger.error("Error creating thumbnail: %s", e.stderr.strip())
+        return None
+
+    return os.path.relpath(target_path, settings.MEDIA_ROOT)
 
 
 def convert_video_to_hls(video_id):
     """
     Converts a video file to HLS format in multiple resolutions.
 
-    This is a multi-step process:
-    1. Re-encodes the original video into separate MP4 files for each resolution.
-    2. Converts each MP4 file into an HLS stream (playlist and segments).
-    3. Cleans up the temporary MP4 files and the original uploaded video.
+    A single ffmpeg process decodes the original video once, scales the
+    frames down from one resolution to the next and encodes each
+    resolution straight into its own HLS variant (playlist and segments), plus a
+    'master.m3u8' playlist that lists all variants. Resolutions above the
+    source's height are not encoded; they are linked to the largest encoded
+    rendition instead. After a successful conversion the original uploaded
+    video is deleted if its thumbnail exists; on failure it is kept so that
+    the conversion can be retried.
 
     Args:
         video_id (int): The primary key of the Video object.
     """
+    if FFMPEG is None or FFPROBE is None:
+        logger.error("'ffmpeg' or 'ffprobe' command not found. Is it installed?")
+        return
+    row = Video.objects.filter(pk=video_id).values_list('video_file', 'thumbnail_url').first()
+    if row is None:
+        logger.error("Video with ID %s not found for HLS conversion.", video_id)
+        return
+    video_file_name, thumbnail_name = row
+    source_path = _video_file_path(video_file_name)
+    base_filename = os.path.splitext(os.path.basename(source_path))[0]
+    base_output_dir = os.path.dirname(source_path)
+    main_video_dir = os.path.join(base_output_dir, base_filename)
+    os.makedirs(main_video_dir, exist_ok=True)
+
+    # A finished video is recognised before its source is probed, since the
+    # run that finished it may already have removed the original.
+    if all(_playlist_complete(os.path.join(main_video_dir, suffix, 'index.m3u8'))
+           for suffix in HLS_SIZES):
+        logger.info("All HLS renditions of Video ID %s already exist.", video_id)
+        _remove_original(source_path, thumbnail_name)
+        return
+
+    logger.info("HLS conversion started for Video ID %s", video_id)
+
     try:
-        video = Video.objects.get(pk=video_id)
-        source_path = video.video_file.path
-        base_filename = os.path.splitext(os.path.basename(source_path))[0]
-        base_output_dir = os.path.dirname(source_path)
-        main_video_dir = os.path.join(base_output_dir, base_filename)
-        os.makedirs(main_video_dir, exist_ok=True)
-
-        print(f"HLS conversion started for Video ID {video_id}")
-    except Video.DoesNotExist:
-        print(f"ERROR: Video with ID {video_id} not found for HLS conversion.")
+        streams = _probe_streams(source_path)
+    except (subprocess.SubprocessError, OSError, ValueError) as e:
+        logger.error("Could not read the streams of %s: %s", source_path, e)
         return
+    audio_codec = next(
+        (stream.get('codec_name') for stream in streams if stream.get('codec_type') == 'audio'),
+        None,
+    )
+    all_sizes = _renditions_for(streams)
 
-    # Define the target resolutions and their dimensions.
-    resolutions = [('480p', '854x480'), ('720p', '1280x720'), ('1080p', '1920x1080')]
-    temp_mp4_files = []
-
-    # --- Step 1: Create temporary MP4 files for each resolution ---
-    print("-> Step 1: Creating temporary MP4 files...")
-    for suffix, size in resolutions:
-        target_mp4_path = os.path.join(main_video_dir, f"{base_filename}_{suffix}.mp4")
-        temp_mp4_files.append(target_mp4_path)
-        # Command to resize (-s) and re-encode the video.
-        cmd_string = (f'ffmpeg -i "{source_path}" -s {size} -c:v libx264 '
-                      f'-crf 23 -c:a aac "{target_mp4_path}"')
-        try:
-            subprocess.run(shlex.split(cmd_string), check=True,
-                           stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=900)
-            print(f"  - Successfully created: {target_mp4_path}")
-        except Exception as e:
-            print(f"  - ERROR creating {target_mp4_path}: {e}")
-            cleanup_files(temp_mp4_files)
-            return
+    # Renditions finished by an earlier, interrupted run are not encoded again.
+    sizes = {
+        suffix: size for suffix, size in all_sizes.items()
+        if not _playlist_complete(os.path.join(main_video_dir, suffix, 'index.m3u8'))
+    }
+    if not sizes:
+        logger.info("All HLS renditions of Video ID %s already exist.", video_id)
+        _link_skipped_renditions(main_video_dir, all_sizes)
+        _remove_original(source_path, thumbnail_name)
+        return
 
-    # --- Step 2: Convert each MP4 file into an HLS stream ---
-    print("-> Step 2: Converting MP4 files to HLS streams...")
-    for mp4_file_path in temp_mp4_files:
-        resolution_suffix = os.path.basename(mp4_file_path).replace(
-            base_filename + '_', '').replace('.mp4', '')
-        # Create a subdirectory for each resolution's HLS files.
-        hls_output_dir = os.path.join(main_video_dir, resolution_suffix)
-        os.makedirs(hls_output_dir, exist_ok=True)
-        hls_playlist_path = os.path.join(hls_output_dir, 'index.m3u8')
-
-        # Command to segment the MP4 into .ts files and create an .m3u8 playlist.
-        # '-c copy' is used for speed as no re-encoding is needed here.
-        cmd_string = (
-            f'ffmpeg -i "{mp4_file_path}" -c:v copy -c:a copy '
-            f'-tag:v hvc1 -bsf:v h264_mp4toannexb '
-            f'-hls_segment_filename "{hls_output_dir}/%03d.ts" '
-            f'-start_number 0 -hls_time 10 -hls_list_size 0 -f hls "{hls_playlist_path}"'
-        )
+    template = _hls_argv_template(tuple(sizes), _video_encoder(), audio_codec,
+                                  sizes == all_sizes, tuple(_thread_args()),
+                                  _probe_args(source_path))
+    paths = {
+        _SOURCE: source_path,
+        _SEGMENTS: os.path.join(main_video_dir, '%v', '%03d.ts'),
+        _PLAYLISTS: os.path.join(main_video_dir, '%v', 'index.m3u8'),
+    }
+    cmd_list = [FFMPEG, *(paths.get(arg, arg) for arg in template)]
+
+    # ffmpeg's error output is streamed to a temporary file instead of
+    # being buffered in memory for the whole encode.
+    with tempfile.TemporaryFile() as stderr_file:
         try:
-            subprocess.run(shlex.split(cmd_string), check=True,
-                           stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=300)
-            print(f"  - Successfully created HLS for {resolution_suffix}.")
+            subprocess.run(cmd_list, check=True,
+                           stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                           stderr=stderr_file, timeout=900)
+            logger.info("Successfully created HLS for %s.", ', '.join(sizes))
         except Exception as e:
             if isinstance(e, subprocess.CalledProcessError):
-                print(f"  -> ERROR during HLS conversion of {mp4_file_path}.\n"
-                      f"  -> STDERR: {e.stderr.strip()}")
+                logger.error("Error during HLS conversion of %s. STDERR: %s",
+                             source_path, _tail(stderr_file))
             else:
-                print(f"  - ERROR during HLS conversion of {mp4_file_path}: {e}")
+                logger.error("Error during HLS conversion of %s: %s", source_path, e)
+            return
+
+    _link_skipped_renditions(main_video_dir, all_sizes)
+    _remove_original(source_path, thumbnail_name)
 
-    # --- Step 3: Clean up temporary files and the original video ---
-    print("-> Step 3: Cleaning up temporary and original files...")
-    cleanup_files(temp_mp4_files)
-    # The original uploaded file is no longer needed.
+
+def _remove_original(source_path, thumbnail_name):
+    """
+    Deletes the original upload once it is no longer needed.
+
+    The conversion job only starts after the thumbnail job, but the
+    thumbnail may still be missing if rendering it failed. The original is
+    then kept, so that the thumbnail can be generated again.
+
+    Args:
+        source_path (str): The path of the original uploaded video.
+        thumbnail_name (str): The stored thumbnail name; empty if there is none.
+    """
+    if not thumbnail_name:
+        logger.warning("Keeping %s until its thumbnail has been generated.", source_path)
+        return
     cleanup_files([source_path])
 
 
+# Placeholders for the per-video paths in an HLS argv template.
+_SOURCE = '<source>'
+_SEGMENTS = '<segments>'
+_PLAYLISTS = '<playlists>'
+
+
+@functools.lru_cache(maxsize=None)
+def _hls_argv_template(suffixes, encoder_name, audio_codec, write_master, thread_args,
+                       probe_args):
+    """
+    Builds the ffmpeg arguments of an HLS conversion, without the paths.
+
+    Everything but the input and output paths only depends on the encoded
+    renditions, the encoder and the source's container and audio, so the
+    arguments are built once per combination and cached for the lifetime of
+    the worker.
+
+    Args:
+        suffixes (tuple): The renditions to encode, ordered from small to large.
+        encoder_name (str): A key of VIDEO_ENCODERS.
+        audio_codec (str): The codec of the source's audio stream, or None.
+        write_master (bool): Whether to write the 'master.m3u8' playlist.
+        thread_args (tuple): The '-threads' arguments, see _thread_args.
+        probe_args (tuple): The input probing arguments, see _probe_args.
+
+    Returns:
+        tuple: The arguments following the ffmpeg binary, with _SOURCE,
+            _SEGMENTS and _PLAYLISTS in place of the paths.
+    """
+    encoder = VIDEO_ENCODERS[encoder_name]
+    has_audio = audio_codec is not None
+    filter_graph = _cascade_filter_graph(
+        {suffix: HLS_SIZES[suffix] for suffix in suffixes}, encoder['filter'])
+
+    # A single HLS muxer writes one variant per resolution into '<resolution>/'
+    # and a master playlist listing all of them.
+    args = [*encoder['input'], *probe_args, '-i', _SOURCE, '-filter_complex', filter_graph]
+    variants = []
+    for i, suffix in enumerate(suffixes):
+        args += ['-map', f'[v{suffix}]']
+        variants.append(f'v:{i},a:{i},name:{suffix}' if has_audio else f'v:{i},name:{suffix}')
+    if has_audio:
+        args += ['-map', '0:a:0'] * len(suffixes)
+    args += [
+        *encoder['output'],
+        *FFMPEG_LOG_ARGS,
+        *thread_args,
+        # AAC audio can go into the segments as-is; anything else is encoded.
+        '-c:a', 'copy' if audio_codec == 'aac' else 'aac',
+        *HLS_MUXER_ARGS,
+        '-hls_segment_filename', _SEGMENTS,
+    ]
+    # When only some renditions are redone, the master playlist written by
+    # the first run still lists all of them.
+    if write_master:
+        args += ['-master_pl_name', 'master.m3u8']
+    args += ['-var_stream_map', ' '.join(variants), _PLAYLISTS]
+    return tuple(args)
+
+
+def _video_file_path(name):
+    """
+    Returns the absolute path of a stored video file.
+
+    Args:
+        name (str): The file name as stored in the 'video_file' column.
+
+    Returns:
+        str: The path of the file in the field's storage.
+    """
+    return Video._meta.get_field('video_file').storage.path(name)
+
+
+def _cascade_filter_graph(sizes, output_filter=''):
+    """
+    Builds the filter graph that scales the source into every rendition.
+
+    The source is decoded once and scaled to the largest rendition; each
+    smaller rendition is then scaled from the next larger one instead of
+    from the full-size source, so the scalers handle far fewer pixels.
+
+    Args:
+        sizes (dict): The renditions to produce, ordered from small to large.
+        output_filter (str): Filters applied to every rendition before it is
+            encoded, e.g. the hardware upload for VAAPI.
+
+    Returns:
+        str: A -filter_complex graph with one '[v<resolution>]' output per rendition.
+    """
+    chains = []
+    source = '[0:v]'
+    renditions = list(sizes.items())[::-1]
+    for i, (suffix, (width, height)) in enumerate(renditions):
+        output = f'[o{i}]' if output_filter else f'[v{suffix}]'
+        if i < len(renditions) - 1:
+            chains.append(f'{source}scale={width}:{height},split=2{output}[n{i}]')
+            source = f'[n{i}]'
+        else:
+            chains.append(f'{source}scale={width}:{height}{output}')
+        if output_filter:
+            chains.append(f'{output}{output_filter}[v{suffix}]')
+    return ';'.join(chains)
+
+
+def _renditions_for(streams):
+    """
+    Returns the HLS renditions worth encoding for a source video.
+
+    Renditions larger than the source would only be upscaled copies, so they
+    are skipped. The smallest rendition is always kept.
+
+    Args:
+        streams (list): The streams of the source as returned by _probe_streams.
+
+    Returns:
+        dict: The subset of HLS_SIZES to encode, in the same order.
+    """
+    source_height = next(
+        (stream.get('height') for stream in streams
+         if stream.get('codec_type') == 'video' and stream.get('height')),
+        None,
+    )
+    if source_height is None:
+        return dict(HLS_SIZES)
+    sizes = {suffix: size for suffix, size in HLS_SIZES.items() if size[1] <= source_height}
+    return sizes or dict([next(iter(HLS_SIZES.items()))])
+
+
+def _playlist_complete(playlist_path):
+    """
+    Checks whether an HLS playlist was written completely.
+
+    ffmpeg appends '#EXT-X-ENDLIST' to a VOD playlist once the last segment
+    of the rendition is finished.
+
+    Args:
+        playlist_path (str): The path of the rendition's 'index.m3u8'.
+
+    Returns:
+        bool: True if the playlist exists and is complete.
+    """
+    try:
+        with open(playlist_path, 'rb') as playlist:
+            return _tail(playlist, max_bytes=64).endswith('#EXT-X-ENDLIST')
+    except OSError:
+        return False
+
+
+def _link_skipped_renditions(main_video_dir, sizes):
+    """
+    Points the directories of skipped renditions to the largest encoded one.
+
+    The API offers every resolution of HLS_SIZES, so a skipped upscale is
+    served from the largest rendition that was actually encoded.
+
+    Args:
+        main_video_dir (str): The HLS directory of the video.
+        sizes (dict): The renditions that were encoded.
+    """
+    largest = list(sizes)[-1]
+    for suffix in HLS_SIZES:
+        if suffix in sizes:
+            continue
+        try:
+            os.symlink(largest, os.path.join(main_video_dir, suffix), target_is_directory=True)
+        except FileExistsError:
+            pass
+        except OSError as e:
+            logger.error("Could not link %s to %s in %s: %s", suffix, largest, main_video_dir, e)
+
+
+@functools.lru_cache(maxsize=None)
+def _available_encoders():
+    """
+    Returns the names of the encoders the installed ffmpeg supports.
+
+    The result is cached for the lifetime of the worker process.
+
+    Returns:
+        frozenset: The encoder names, empty if ffmpeg could not be queried.
+    """
+    try:
+        result = subprocess.run([FFMPEG, '-hide_banner', '-encoders'], check=True,
+                                stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=30)
+    except (subprocess.SubprocessError, OSError) as e:
+        logger.error("Could not list the ffmpeg encoders: %s", e)
+        return frozenset()
+    # The encoder list follows a ' ------' separator line: ' V....D name  description'.
+    listing = result.stdout.split('------', 1)[-1]
+    return frozenset(line.split()[1] for line in listing.splitlines() if len(line.split()) > 1)
+
+
+def _video_encoder():
+    """
+    Returns the H.264 encoder to use for the HLS conversion.
+
+    The encoder configured in VIDEOFLIX_FFMPEG_VCODEC is used if it is known
+    and the installed ffmpeg supports it; otherwise libx264 is used. With
+    'auto' the encoder is picked from the hardware of the worker host.
+
+    Returns:
+        str: A key of VIDEO_ENCODERS.
+    """
+    codec = settings.VIDEOFLIX_FFMPEG_VCODEC
+    if codec == 'libx264':
+        return codec
+    if codec == 'auto':
+        return _detect_hardware_encoder()
+    if codec not in VIDEO_ENCODERS or codec not in _available_encoders():
+        logger.warning("Video encoder %s is not available, falling back to libx264.", codec)
+        return 'libx264'
+    return codec
+
+
+def _detect_hardware_encoder():
+    """
+    Returns the best H.264 encoder for the hardware of this host.
+
+    NVENC is used if an NVIDIA driver is installed, VAAPI if a render device
+    exists, as long as the installed ffmpeg supports the encoder.
+
+    Returns:
+        str: A key of VIDEO_ENCODERS.
+    """
+    available = _available_encoders()
+    if shutil.which('nvidia-smi') and 'h264_nvenc' in available:
+        return 'h264_nvenc'
+    if os.path.exists(VAAPI_DEVICE) and 'h264_vaapi' in available:
+        return 'h264_vaapi'
+    return 'libx264'
+
+
+def _probe_args(source_path):
+    """
+    Returns the arguments that limit how much of an input ffmpeg probes.
+
+    Args:
+        source_path (str): The path of the input file.
+
+    Returns:
+        tuple: FAST_PROBE_ARGS for the containers in HEADER_CONTAINERS,
+            otherwise no arguments.
+    """
+    if os.path.splitext(source_path)[1].lower() in HEADER_CONTAINERS:
+        return FAST_PROBE_ARGS
+    return ()
+
+
+def _thread_args():
+    """
+    Returns the ffmpeg arguments that cap the threads of one job.
+
+    Several capped jobs on parallel RQ workers use the CPUs better than one
+    job spreading over all cores. 0 lets ffmpeg decide.
+
+    Returns:
+        list: ['-threads', '<n>'] or an empty list for 0.
+    """
+    threads = settings.VIDEOFLIX_FFMPEG_THREADS
+    return ['-threads', str(threads)] if threads else []
+
+
+def _probe_streams(source_path):
+    """
+    Returns the streams of a media file as reported by ffprobe.
+
+    Args:
+        source_path (str): The path of the media file.
+
+    Returns:
+        list: One dict per stream with its 'codec_type', 'codec_name' and,
+            for video streams, 'width' and 'height'.
+
+    Raises:
+        subprocess.SubprocessError: If ffprobe fails or times out.
+        OSError: If ffprobe cannot be executed.
+        ValueError: If ffprobe's output is not valid JSON.
+    """
+    cmd_list = [FFPROBE, '-v', 'error',
+                '-show_entries', 'stream=codec_type,codec_name,width,height',
+                '-of', 'json', source_path]
+    result = subprocess.run(cmd_list, check=True,
+                            stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=60)
+    return json.loads(result.stdout).get('streams', [])
+
+
+def _tail(file, max_bytes=4096):
+    """
+    Returns the end of a binary file as text.
+
+    Args:
+        file: An open binary file object.
+        max_bytes (int): The maximum number of bytes to return.
+
+    Returns:
+        str: The last `max_bytes` bytes of the file, stripped of whitespace.
+    """
+    file.seek(0, os.SEEK_END)
+    file.seek(max(file.tell() - max_bytes, 0))
+    return file.read().decode(errors='replace').strip()
+
+
 def cleanup_files(file_list):
     """
     A helper function to safely delete a list of files.
+
+    Files that do not exist are skipped.
     """
     for file_path in file_list:
         try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                print(f"  - Deleted: {file_path}")
+            os.remove(file_path)
+            logger.debug("Deleted: %s", file_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error("Error deleting file %s: %s", file_path, e)
+
+
+def cleanup_video_files(file_paths, hls_dir=None):
+    """
+    Deletes the files of a deleted video.
+
+    This function is intended to be run as a background task, so that
+    deleting a video does not wait for its (possibly large) HLS directory
+    to be removed. Files that no longer exist are skipped, and only one
+    summary line is logged rather than one line per file.
+
+    Args:
+        file_paths (list): Paths of single files to delete, such as the
+            thumbnail and the original upload.
+        hls_dir (str): Path of the video's HLS directory to delete recursively.
+    """
+    for file_path in file_paths:
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
         except OSError as e:
-            print(f"  - Error deleting file {file_path}: {e}")
+            logger.error("Error when deleting %s: %s", file_path, e)
+
+    if hls_dir:
+        try:
+            _parallel_rmtree(hls_dir)
+        except OSError as e:
+            logger.warning("Parallel delete of %s failed, removing the rest: %s", hls_dir, e)
+            _fast_rmtree(hls_dir)
+    logger.info("Deleted %d file(s) and the HLS directory %s", len(file_paths), hls_dir)
+
+
+def _parallel_rmtree(path):
+    """
+    Recursively deletes a directory, unlinking its files in parallel.
+
+    The files of each directory are removed by a thread pool so the
+    filesystem latency of the individual unlinks overlaps, then the
+    directories are removed bottom-up. Where the platform supports it, the
+    tree is walked with os.fwalk and every entry is removed relative to an
+    open file descriptor of its directory (unlinkat), so the kernel does
+    not resolve the full path again for each of the thousands of segments.
+    A directory that does not exist is ignored.
+
+    Args:
+        path (str): The directory to delete.
+
+    Raises:
+        OSError: If a file or directory cannot be removed.
+    """
+    with ThreadPoolExecutor(max_workers=HLS_DELETE_WORKERS) as executor:
+        if hasattr(os, 'fwalk') and os.unlink in os.supports_dir_fd:
+            if not os.path.isdir(path):
+                return
+            for _, dirnames, filenames, dir_fd in os.fwalk(path, topdown=False):
+                # The descriptor is only valid until the next iteration.
+                list(executor.map(lambda name: os.unlink(name, dir_fd=dir_fd), filenames))
+                for name in dirnames:
+                    try:
+                        os.rmdir(name, dir_fd=dir_fd)
+                    except NotADirectoryError:
+                        # A link to another rendition, see _link_skipped_renditions.
+                        os.unlink(name, dir_fd=dir_fd)
+            os.rmdir(path)
+            return
+
+        files = []
+        directories = []
+        for root, dirnames, filenames in os.walk(path, topdown=False):
+            files.extend(os.path.join(root, name) for name in filenames)
+            files.extend(os.path.join(root, name) for name in dirnames
+                         if os.path.islink(os.path.join(root, name)))
+            directories.append(root)
+        list(executor.map(os.unlink, files))
+    for directory in directories:
+        os.rmdir(directory)
+
+
+def _fast_rmtree(path):
+    """
+    Recursively deletes a directory as fast as the platform allows.
+
+    On POSIX systems the native 'rm -rf' is used, which removes an HLS
+    directory with thousands of segments much faster than walking it in
+    Python. If 'rm' is not available or fails, shutil.rmtree is used.
+    Entries that cannot be removed are skipped rather than aborting the
+    cleanup of the remaining segments.
+
+    Args:
+        path (str): The directory to delete.
+    """
+    if os.name == 'posix' and shutil.which('rm'):
+        try:
+            subprocess.run(['rm', '-rf', '--', path], check=True,
+                           stdin=subprocess.DEVNULL, capture_output=True, text=True)
+            return
+        except (subprocess.CalledProcessError, OSError) as e:
+            logger.warning("'rm -rf' failed for %s, falling back to shutil: %s", path, e)
+    shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,32 @@
+import os
+import shutil
+import tempfile
+
+from django.test import override_settings
+
+# Name of the pytest-xdist worker running the tests; keeps the temporary
+# media directories of parallel workers apart.
+XDIST_WORKER = os.environ.get('PYTEST_XDIST_WORKER', 'main')
+
+# Commands an HLS conversion runs per video: ffprobe, then a single ffmpeg
+# call that encodes all renditions.
+HLS_COMMANDS_PER_VIDEO = 2
+
+
+class TempMediaRootMixin:
+    """
+    Points MEDIA_ROOT to a temporary directory for a whole test class.
+
+    The directory is created when the class is set up instead of when the
+    module is imported, so collecting the tests creates no directories. It
+    is removed after the last test of the class.
+    """
+    media_root_prefix = 'videoflix_test_media_'
+
+    @classmethod
+    def setUpClass(cls):
+        """Create the media directory before the class's test data is set up."""
+        cls.media_root = tempfile.mkdtemp(prefix=f'{cls.media_root_prefix}{XDIST_WORKER}_')
+        cls.addClassCleanup(shutil.rmtree, cls.media_root, ignore_errors=True)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=cls.media_root))
+        super().setUpClass()
@@ -1,112 +1,283 @@
 import os
-import tempfile
-from unittest.mock import patch, call
+from collections import defaultdict
+from unittest.mock import MagicMock, patch
 
+from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
-from django.test import TestCase, override_settings
+from django.db.models.signals import post_save
+from django.test import TestCase
+from django.urls import reverse
 
 from ..models import Video
-from ..tasks import generate_thumbnail, convert_video_to_hls
+from . import HLS_COMMANDS_PER_VIDEO, TempMediaRootMixin
+from ..signals import enqueue_videos, flush_video_processing, video_post_save
+from ..tasks import (
+    generate_thumbnail, convert_video_to_hls, cleanup_video_files, _fast_rmtree, _parallel_rmtree,
+)
 
 FAKE_VIDEO_CONTENT = b'GIF89a\x01\x00\x01\x00\x00\x00\x00\x00'
-TEMP_MEDIA_ROOT = tempfile.mkdtemp(prefix='videoflix_test_media_')
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
-class SignalsAndTasksTest(TestCase):
+
+def mock_queues(mock_get_queue):
+    """
+    Makes a patched django_rq.get_queue return a separate mock per queue name.
+
+    The enqueue_many of each queue returns jobs with the ids '<queue>:<n>'.
+    """
+    queues = defaultdict(MagicMock)
+
+    def get_queue(name):
+        queue = queues[name]
+        queue.enqueue_many.side_effect = lambda jobs, **kwargs: [
+            MagicMock(id=f'{name}:{i}') for i in range(len(jobs))]
+        return queue
+
+    mock_get_queue.side_effect = get_queue
+    return queues
+
+
+def enqueued_jobs(queue):
+    """Returns (func, args) of all jobs passed to a mock queue's enqueue_many."""
+    return [(job.func, job.args)
+            for call in queue.enqueue_many.call_args_list for job in call.args[0]]
+
+class SignalsAndTasksTest(TempMediaRootMixin, TestCase):
     """
     Test suite for Django signals and background tasks.
 
     This class tests that:
     1. The post_save signal correctly enqueues background tasks.
-    2. The post_delete signal correctly cleans up associated files.
+    2. The post_delete signal correctly schedules the cleanup of associated files.
     3. The background task functions call their external dependencies (like ffmpeg)
        with the correct arguments.
     """
 
-    def setUp(self):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Set up the test video once for all test methods.
+
+        The database row is restored for every test; no file is written.
         """
-        Set up the test environment before each test method runs.
-        """
-        # Arrange: Create a fake video file in memory.
-        fake_video_file = SimpleUploadedFile(
-            "test_video.mp4",
-            FAKE_VIDEO_CONTENT,
-            content_type="video/mp4"
-        )
-        # Arrange: Create a Video object, which will save the fake file
-        # to the temporary media root.
-        self.video = Video.objects.create(
+        # Arrange: Create a Video row that points at an upload name; the
+        # tasks under test are mocked, so no file needs to be written.
+        # bulk_create does not send post_save, so no processing is
+        # scheduled for the fixture itself.
+        [cls.video] = Video.objects.bulk_create([Video(
             title="Test Video",
             description="A test description",
             category="Testing",
-            video_file=fake_video_file
-        )
-
-    def tearDown(self):
-        """
-        Clean up the temporary media directory after each test.
-        """
-        # This is a robust way to remove the temporary directory and its contents.
-        for root, dirs, files in os.walk(TEMP_MEDIA_ROOT, topdown=False):
-            for name in files:
-                try:
-                    os.remove(os.path.join(root, name))
-                except OSError:
-                    pass
-            for name in dirs:
-                try:
-                    os.rmdir(os.path.join(root, name))
-                except OSError:
-                    pass
+            video_file='videos/test_video.mp4'
+        )])
+
+    def setUp(self):
+        """
+        Make sure the video directory exists.
+
+        The tasks write their output next to the video.
+        """
+        os.makedirs(os.path.dirname(self.video.video_file.path), exist_ok=True)
 
     @patch('videoflix_app.signals.django_rq.get_queue')
     def test_post_save_signal_enqueues_correct_tasks(self, mock_get_queue):
         """
         Test that creating a new Video object triggers the post_save signal
-        and enqueues the thumbnail and HLS conversion tasks.
+        and enqueues the thumbnail and HLS conversion tasks once the
+        transaction commits.
         """
-        mock_queue = mock_get_queue.return_value
+        # The conftest disconnects the receiver for every test; this test
+        # exercises it, so it is connected again for the test's duration.
+        post_save.connect(video_post_save, sender=Video)
+        self.addCleanup(post_save.disconnect, video_post_save, sender=Video)
+        queues = mock_queues(mock_get_queue)
         new_video_file = SimpleUploadedFile("new.mp4", FAKE_VIDEO_CONTENT)
 
-        new_video = Video.objects.create(
-            title="New",
-            description="d",
-            category="c",
-            video_file=new_video_file
-        )
-
-        expected_calls = [
-            call('videoflix_app.tasks.generate_thumbnail', new_video.pk),
-            call('videoflix_app.tasks.convert_video_to_hls', new_video.pk)
-        ]
-        mock_queue.enqueue.assert_has_calls(expected_calls, any_order=True)
-
-    @patch('videoflix_app.signals.shutil.rmtree')
-    @patch('videoflix_app.signals.os.remove')
-    @patch('videoflix_app.signals.os.path.isfile', return_value=True)
-    @patch('videoflix_app.signals.os.path.isdir', return_value=True)
-    def test_post_delete_signal_removes_main_directory(
-            self, mock_isdir, mock_isfile, mock_os_remove, mock_rmtree):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            new_video = Video.objects.create(
+                title="New",
+                description="d",
+                category="c",
+                video_file=new_video_file
+            )
+            mock_get_queue.assert_not_called()
+
+        self.assertEqual(callbacks, [flush_video_processing])
+        self.assertEqual(enqueued_jobs(queues['thumbnails']), [
+            ('videoflix_app.tasks.generate_thumbnail', (new_video.pk,)),
+        ])
+        self.assertEqual(enqueued_jobs(queues['hls']), [
+            ('videoflix_app.tasks.convert_video_to_hls', (new_video.pk,)),
+        ])
+
+    @patch('videoflix_app.signals.django_rq.get_queue')
+    def test_enqueue_videos_converts_after_the_thumbnails(self, mock_get_queue):
+        """
+        Test that the HLS jobs of several videos wait for their shared
+        thumbnail job, since a finished conversion deletes the original.
+        """
+        queues = mock_queues(mock_get_queue)
+
+        enqueue_videos([1, 2])
+
+        self.assertEqual(enqueued_jobs(queues['thumbnails']), [
+            ('videoflix_app.tasks.generate_thumbnails_batch', ([1, 2],)),
+        ])
+        hls_jobs = [job for call in queues['hls'].enqueue_many.call_args_list
+                    for job in call.args[0]]
+        self.assertEqual([job.args for job in hls_jobs], [(1,), (2,)])
+        for job in hls_jobs:
+            self.assertEqual(job.depends_on.dependencies, ['thumbnails:0'])
+            # A failed thumbnail must not block the conversion.
+            self.assertTrue(job.depends_on.allow_failure)
+
+    @patch('videoflix_app.signals.django_rq.get_queue')
+    def test_videos_created_in_one_transaction_are_enqueued_together(self, mock_get_queue):
+        """
+        Test that videos created in one transaction share a single enqueue.
+        """
+        queues = mock_queues(mock_get_queue)
+        other_video = Video.objects.create(
+            title="Other", description="d", category="c",
+            video_file='videos/other.mp4')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for video in (self.video, other_video):
+                video_post_save(sender=Video, instance=video, created=True)
+
+        queues['hls'].enqueue_many.assert_called_once()
+        self.assertCountEqual([args for _, args in enqueued_jobs(queues['hls'])], [
+            (self.video.pk,), (other_video.pk,),
+        ])
+
+    @patch('videoflix_app.signals.django_rq.get_queue')
+    def test_post_delete_signal_enqueues_file_cleanup(self, mock_get_queue):
         """
         Test that deleting a Video object triggers the post_delete signal,
-        which should attempt to remove the original file and HLS directory.
+        which should enqueue the removal of the original file and HLS
+        directory once the deletion is committed.
         """
+        queues = mock_queues(mock_get_queue)
         original_path = self.video.video_file.path
         base_filename = os.path.splitext(os.path.basename(original_path))[0]
         video_dir = os.path.dirname(original_path)
         expected_dir_to_delete = os.path.join(video_dir, base_filename)
-        self.video.delete()
 
-        mock_os_remove.assert_called_with(original_path)
-        mock_rmtree.assert_called_with(expected_dir_to_delete)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.video.delete()
+            mock_get_queue.assert_not_called()
+
+        queues['deletes'].enqueue.assert_called_once_with(
+            'videoflix_app.tasks.cleanup_video_files', [original_path], expected_dir_to_delete)
+
+    @patch('videoflix_app.signals.django_rq.get_queue')
+    def test_post_delete_signal_uses_stored_base_filename(self, mock_get_queue):
+        """
+        Test that the HLS directory is named after the stored base_filename.
+        """
+        queues = mock_queues(mock_get_queue)
+        self.video.base_filename = 'stored_name'
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.video.delete()
+
+        hls_dir = queues['deletes'].enqueue.call_args.args[2]
+        self.assertEqual(hls_dir, os.path.join(
+            os.path.dirname(self.video.video_file.path), 'stored_name'))
+
+    @patch('videoflix_app.signals.django_rq.get_queue')
+    def test_admin_changelist_delete_enqueues_file_cleanup(self, mock_get_queue):
+        """
+        Test that deleting through the admin changelist action, which loads
+        the videos with deferred fields, still schedules the file cleanup.
+        """
+        queues = mock_queues(mock_get_queue)
+        admin_user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='password')
+        self.client.force_login(admin_user)
+        original_path = self.video.video_file.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('admin:videoflix_app_video_changelist'), {
+                'action': 'delete_selected',
+                '_selected_action': [self.video.pk],
+                'post': 'yes',
+            })
+
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Video.objects.filter(pk=self.video.pk).exists())
+        queues['deletes'].enqueue.assert_called_once_with(
+            'videoflix_app.tasks.cleanup_video_files', [original_path],
+            os.path.join(os.path.dirname(original_path), 'test_video'))
+
+    @patch('videoflix_app.tasks._parallel_rmtree')
+    @patch('videoflix_app.tasks.os.remove')
+    def test_cleanup_video_files_task_removes_files_and_directory(
+            self, mock_os_remove, mock_rmtree):
+        """
+        Test that the cleanup task removes the given files and the HLS directory.
+        """
+        cleanup_video_files(['/media/videos/a.mp4'], '/media/videos/a')
+
+        mock_os_remove.assert_called_once_with('/media/videos/a.mp4')
+        mock_rmtree.assert_called_once_with('/media/videos/a')
+
+    @patch('videoflix_app.tasks._fast_rmtree')
+    @patch('videoflix_app.tasks._parallel_rmtree', side_effect=PermissionError('denied'))
+    def test_cleanup_video_files_falls_back_to_fast_rmtree(self, mock_parallel, mock_fast):
+        """
+        Test that a failed parallel delete is finished by _fast_rmtree.
+        """
+        cleanup_video_files([], '/media/videos/a')
+
+        mock_fast.assert_called_once_with('/media/videos/a')
+
+    def test_parallel_rmtree_removes_directory(self):
+        """
+        Test that all segments and rendition directories are removed.
+        """
+        hls_dir = os.path.join(self.media_root, 'hls_parallel')
+        for resolution in ('480p', '720p'):
+            os.makedirs(os.path.join(hls_dir, resolution))
+            for i in range(3):
+                open(os.path.join(hls_dir, resolution, f'{i:03d}.ts'), 'wb').close()
+
+        os.symlink('720p', os.path.join(hls_dir, '1080p'))
+
+        _parallel_rmtree(hls_dir)
+
+        self.assertFalse(os.path.lexists(hls_dir))
+
+    def test_fast_rmtree_removes_directory(self):
+        """
+        Test that the HLS directory is removed including its segments.
+        """
+        hls_dir = os.path.join(self.media_root, 'hls_to_delete', '480p')
+        os.makedirs(hls_dir)
+        open(os.path.join(hls_dir, '000.ts'), 'wb').close()
+
+        _fast_rmtree(os.path.dirname(hls_dir))
+
+        self.assertFalse(os.path.exists(os.path.dirname(hls_dir)))
+
+    @patch('videoflix_app.tasks.shutil.rmtree')
+    @patch('videoflix_app.tasks.subprocess.run', side_effect=OSError('no rm'))
+    def test_fast_rmtree_falls_back_to_shutil(self, mock_run, mock_rmtree):
+        """
+        Test that shutil.rmtree is used if 'rm' cannot be executed.
+        """
+        _fast_rmtree('/media/videos/a')
+
+        mock_rmtree.assert_called_once_with('/media/videos/a', ignore_errors=True)
 
     @patch('subprocess.run')
     def test_generate_thumbnail_task(self, mock_subprocess_run):
         """
         Test the thumbnail generation task to ensure it calls subprocess.run.
         """
-        generate_thumbnail(self.video.pk)
+        # One SELECT of the file names and one UPDATE of the thumbnail.
+        with self.assertNumQueries(2):
+            generate_thumbnail(self.video.pk)
         self.assertTrue(mock_subprocess_run.called)
 
     @patch('videoflix_app.tasks.os.remove')
@@ -117,15 +288,17 @@ class SignalsAndTasksTest(TestCase):
         """
         Test the HLS conversion task's internal logic.
         """
+        mock_subprocess_run.return_value.stdout = '{"streams": []}'
+        Video.objects.filter(pk=self.video.pk).update(thumbnail_url='thumbnails/test_video.jpg')
         convert_video_to_hls(self.video.pk)
-        self.assertEqual(mock_subprocess_run.call_count, 6)
+        self.assertEqual(mock_subprocess_run.call_count, HLS_COMMANDS_PER_VIDEO)
 
-        call_args_hls = mock_subprocess_run.call_args_list[3].args[0]
+        call_args_hls = mock_subprocess_run.call_args.args[0]
         command_str_hls = ' '.join(call_args_hls)
         
-        self.assertIn('test_video_480p.mp4', command_str_hls)
-        self.assertIn('-c:v copy', command_str_hls)
-        self.assertIn('-c:a copy', command_str_hls)
-        self.assertNotIn('-codec:copy', command_str_hls)
+        self.assertIn('test_video.mp4', command_str_hls)
+        self.assertNotIn('test_video_480p.mp4', command_str_hls)
+        self.assertIn('-f hls', command_str_hls)
 
-        self.assertEqual(mock_remove.call_count, 4)
+        # Only the original upload is removed; there are no temporary files.
+        mock_remove.assert_called_once_with(self.video.video_file.path)
@@ -1,9 +1,18 @@
-from rest_framework.test import APITestCase, APIClient
+import gzip
+import os
+import tempfile
+from datetime import date, datetime, timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase, APIClient, APIRequestFactory
 from rest_framework import status
 from django.contrib.auth.models import User
-from django.urls import reverse
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import clear_script_prefix, reverse, set_script_prefix
 
-from ..models import Video
+from core.renderers import ORJSONRenderer
+from ..api.serializers import VideoDetailSerializer
+from ..models import Video, HLS_BASE_FILENAME_CACHE_KEY
 
 
 class VideoAPITest(APITestCase):
@@ -13,55 +22,87 @@ class VideoAPITest(APITestCase):
     This class contains tests for the list and detail views of the Video API,
     covering authentication, data retrieval, and error handling.
     """
-    def setUp(self):
+    INVALID_DETAIL_URL = '/api/video/9999/'
+
+    @classmethod
+    def setUpTestData(cls):
         """
-        Set up the necessary objects and data for the tests.
+        Create the user, the videos and their URLs once for all tests in
+        this class.
 
-        This method runs before each individual test method in this class.
+        The database changes of each test are rolled back afterwards.
         """
-        self.list_url = reverse('video-list')
-        self.user = User.objects.create_user(
+        cls.user = User.objects.create_user(
             username='testuser',
             password='testpassword123'
         )
-        self.client = APIClient()
-        self.video1 = Video.objects.create(
-            title="The rise of TDD",
-            description="An epic drama about test-driven development.",
-            category="Education"
-        )
-        self.video2 = Video.objects.create(
-            title="The hunt for the green test",
-            description="An exciting thriller.",
-            category="Thriller"
-        )
-        self.detail_url = reverse('video-detail', kwargs={'pk': self.video1.pk})
+        # One INSERT for both videos, without the post_save processing.
+        cls.video1, cls.video2 = Video.objects.bulk_create([
+            Video(
+                title="The rise of TDD",
+                description="An epic drama about test-driven development.",
+                category="Education"
+            ),
+            Video(
+                title="The hunt for the green test",
+                description="An exciting thriller.",
+                category="Thriller"
+            ),
+        ])
+        cls.list_url = reverse('video-list')
+        cls.detail_url = reverse('video-detail', kwargs={'pk': cls.video1.pk})
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        Create one anonymous and one authenticated client for all tests.
+        """
+        super().setUpClass()
+        cls.anon_client = APIClient()
+        cls.auth_client = APIClient()
+        cls.auth_client.force_authenticate(user=cls.user)
 
     def test_unauthenticated_user_cannot_access_video_list(self):
         """
         Ensure that unauthenticated users receive a 401 Unauthorized error
         when trying to access the video list.
         """
-        response = self.client.get(self.list_url)
+        response = self.anon_client.get(self.list_url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
     def test_authenticated_user_can_access_video_list_and_data_is_correct(self):
         """
         Ensure that an authenticated user can access the video list and that
-        it contains the correct number of items.
+        it contains the correct number of items with a single query.
         """
-        self.client.force_authenticate(user=self.user)
-        response = self.client.get(self.list_url)
+        with self.assertNumQueries(1):
+            response = self.auth_client.get(self.list_url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 2)
 
+    def test_video_list_is_paginated_when_page_is_requested(self):
+        """
+        Ensure that the video list returns a paginated envelope, newest video
+        first, when the 'page' query parameter is given. Both videos share one
+        timestamp, so the newer id decides.
+        """
+        Video.objects.update(created_at=datetime(2024, 5, 1, tzinfo=timezone.utc))
+
+        response = self.auth_client.get(self.list_url, {'page': 1, 'page_size': 1})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertIsNotNone(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['id'], self.video2.pk)
+
     def test_unauthenticated_user_cannot_access_detail_view(self):
         """
         Ensure that unauthenticated users receive a 401 Unauthorized error
         when trying to access the video detail view.
         """
-        response = self.client.get(self.detail_url)
+        response = self.anon_client.get(self.detail_url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
     def test_authenticated_user_can_access_detail_view(self):
@@ -69,24 +110,252 @@ class VideoAPITest(APITestCase):
         Ensure that an authenticated user can access the detail view and that
         the serialized data is correct, including custom serializer fields.
         """
-        self.client.force_authenticate(user=self.user)
-        response = self.client.get(self.detail_url)
+        response = self.auth_client.get(self.detail_url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data['title'], self.video1.title)
-        
-        self.assertIn('hls_urls', response.data)
-        self.assertIn('720p', response.data['hls_urls'])
-        
+        body = response.data
+        self.assertEqual(body['title'], self.video1.title)
+
+        self.assertIn('hls_urls', body)
+        hls_urls = body['hls_urls']
+        self.assertIn('720p', hls_urls)
+
         expected_url_part = f'/api/video/{self.video1.pk}/720p/index.m3u8'
-        self.assertIn(expected_url_part, response.data['hls_urls']['720p'])
+        self.assertIn(expected_url_part, hls_urls['720p'])
+
+    def test_hls_urls_follow_the_script_prefix(self):
+        """
+        Ensure the HLS URLs are built under the script prefix of the current
+        request, even after they were built for another prefix.
+        """
+        self.auth_client.get(self.detail_url)
+
+        set_script_prefix('/videoflix/')
+        self.addCleanup(clear_script_prefix)
+        response = self.auth_client.get(self.detail_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['hls_urls']['720p'].endswith(
+            f'/videoflix/api/video/{self.video1.pk}/720p/index.m3u8'))
 
     def test_detail_view_returns_404_for_invalid_id(self):
         """
         Ensure that the detail view returns a 404 Not Found error when
         requested with a primary key that does not exist.
         """
-        self.client.force_authenticate(user=self.user)
-        invalid_url = reverse('video-detail', kwargs={'pk': 9999})
-        response = self.client.get(invalid_url)
+        response = self.auth_client.get(self.INVALID_DETAIL_URL)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data, {'error': 'Video not found'})
+
+    def test_hls_playlist_resolves_base_filename_from_cache(self):
+        """
+        Ensure the HLS playlist view serves the playlist file and that repeated
+        requests resolve the video's directory without querying the database.
+        """
+        cache.clear()
+        self.video1.video_file.name = 'videos/tdd.mp4'
+        self.video1.save()
+        playlist_url = reverse(
+            'hls-playlist', kwargs={'movie_id': self.video1.pk, 'resolution': '720p'})
+
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            playlist_dir = os.path.join(media_root, 'videos', 'tdd', '720p')
+            os.makedirs(playlist_dir)
+            with open(os.path.join(playlist_dir, 'index.m3u8'), 'wb') as f:
+                f.write(b'#EXTM3U\n')
+
+            response = self.auth_client.get(playlist_url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(b''.join(response.streaming_content), b'#EXTM3U\n')
+            self.assertIn('max-age=60', response['Cache-Control'])
+
+            with self.assertNumQueries(0):
+                response = self.auth_client.get(playlist_url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            response.close()
+
+    def test_hls_playlist_derives_base_filename_without_stored_name(self):
+        """
+        Ensure the HLS playlist view finds the files of a video whose row was
+        written without Video.save() and has no stored base filename, and that
+        a video without an upload is not cached as an empty name.
+        """
+        cache.clear()
+        Video.objects.filter(pk=self.video1.pk).update(video_file='videos/tdd.mp4')
+        playlist_url = reverse(
+            'hls-playlist', kwargs={'movie_id': self.video1.pk, 'resolution': '720p'})
+        missing_url = reverse(
+            'hls-playlist', kwargs={'movie_id': self.video2.pk, 'resolution': '720p'})
+
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            playlist_dir = os.path.join(media_root, 'videos', 'tdd', '720p')
+            os.makedirs(playlist_dir)
+            with open(os.path.join(playlist_dir, 'index.m3u8'), 'wb') as f:
+                f.write(b'#EXTM3U\n')
+
+            response = self.auth_client.get(playlist_url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            response.close()
+
+            response = self.auth_client.get(missing_url)
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertIsNone(cache.get(HLS_BASE_FILENAME_CACHE_KEY.format(self.video2.pk)))
+
+    def test_hls_segment_is_delegated_to_nginx_when_configured(self):
+        """
+        Ensure the HLS segment view returns an X-Accel-Redirect header instead
+        of the file contents when HLS_ACCEL_REDIRECT_PREFIX is set.
+        """
+        cache.clear()
+        self.video1.video_file.name = 'videos/tdd.mp4'
+        self.video1.save()
+        segment_url = reverse('hls-segment', kwargs={
+            'movie_id': self.video1.pk, 'resolution': '720p', 'segment': '000.ts'})
+
+        with self.settings(HLS_ACCEL_REDIRECT_PREFIX='/protected_hls/'):
+            response = self.auth_client.get(segment_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected_hls/tdd/720p/000.ts')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Content-Type'], 'video/MP2T')
+        self.assertEqual(response.content, b'')
+
+    def test_hls_segment_accel_redirect_is_percent_encoded(self):
+        """
+        Ensure a non-ASCII upload name is percent-encoded in the
+        X-Accel-Redirect header, so nginx can resolve the internal location.
+        """
+        cache.clear()
+        Video.objects.filter(pk=self.video1.pk).update(
+            video_file='videos/vidéo 测试.mp4', base_filename='vidéo 测试')
+        segment_url = reverse('hls-segment', kwargs={
+            'movie_id': self.video1.pk, 'resolution': '720p', 'segment': '000.ts'})
+
+        with self.settings(HLS_ACCEL_REDIRECT_PREFIX='/protected_hls/'):
+            response = self.auth_client.get(segment_url)
+
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            '/protected_hls/vid%C3%A9o%20%E6%B5%8B%E8%AF%95/720p/000.ts')
+
+    def test_hls_segment_serves_requested_byte_range(self):
+        """
+        Ensure the HLS segment view answers a Range request with 206 Partial
+        Content and only the requested bytes.
+        """
+        cache.clear()
+        self.video1.video_file.name = 'videos/tdd.mp4'
+        self.video1.save()
+        segment_url = reverse('hls-segment', kwargs={
+            'movie_id': self.video1.pk, 'resolution': '720p', 'segment': '000.ts'})
+
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            segment_dir = os.path.join(media_root, 'videos', 'tdd', '720p')
+            os.makedirs(segment_dir)
+            with open(os.path.join(segment_dir, '000.ts'), 'wb') as f:
+                f.write(b'0123456789')
+
+            response = self.auth_client.get(segment_url, HTTP_RANGE='bytes=2-5')
+            self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+            self.assertEqual(response.content, b'2345')
+            self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+
+            response = self.auth_client.get(segment_url, HTTP_RANGE='bytes=10-')
+            self.assertEqual(
+                response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+    def test_hls_playlist_ignores_range_requests(self):
+        """
+        Ensure the gzip-compressed HLS playlist view answers a Range request
+        with the whole playlist instead of a partial response.
+        """
+        cache.clear()
+        self.video1.video_file.name = 'videos/tdd.mp4'
+        self.video1.save()
+        playlist_url = reverse(
+            'hls-playlist', kwargs={'movie_id': self.video1.pk, 'resolution': '720p'})
+
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            playlist_dir = os.path.join(media_root, 'videos', 'tdd', '720p')
+            os.makedirs(playlist_dir)
+            with open(os.path.join(playlist_dir, 'index.m3u8'), 'wb') as f:
+                f.write(b'#EXTM3U\n')
+
+            response = self.auth_client.get(
+                playlist_url, HTTP_RANGE='bytes=0-3', HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('Content-Range', response)
+            self.assertEqual(
+                gzip.decompress(b''.join(response.streaming_content)), b'#EXTM3U\n')
+
+    def test_hls_playlist_returns_404_when_not_converted_yet(self):
+        """
+        Ensure the HLS playlist view returns 404 Not Found while the playlist
+        file does not exist on disk.
+        """
+        cache.clear()
+        self.video1.video_file.name = 'videos/tdd.mp4'
+        self.video1.save()
+        playlist_url = reverse(
+            'hls-playlist', kwargs={'movie_id': self.video1.pk, 'resolution': '720p'})
+
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            response = self.auth_client.get(playlist_url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_base_filename_follows_the_stored_upload_name(self):
+        """
+        Ensure that `base_filename` is derived from the name the storage
+        actually assigned, even if the uploaded name was already taken.
+        """
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            first, second = (
+                Video.objects.create(
+                    title=title, description="d", category="c",
+                    video_file=SimpleUploadedFile("clip.mp4", b"data"))
+                for title in ("First", "Second")
+            )
+
+        self.assertEqual(first.base_filename, 'clip')
+        self.assertNotEqual(second.base_filename, 'clip')
+        self.assertEqual(second.video_file.name, f'videos/{second.base_filename}.mp4')
+        self.assertEqual(
+            Video.objects.get(pk=second.pk).base_filename, second.base_filename)
+
+    def test_hls_views_reject_unknown_resolutions(self):
+        """
+        Ensure the HLS views return 404 Not Found for resolutions that are
+        not produced by the conversion, such as path traversal attempts.
+        """
+        playlist_url = reverse(
+            'hls-playlist', kwargs={'movie_id': self.video1.pk, 'resolution': '..'})
+        segment_url = reverse('hls-segment', kwargs={
+            'movie_id': self.video1.pk, 'resolution': '..', 'segment': '000.ts'})
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.auth_client.get(playlist_url).status_code, status.HTTP_404_NOT_FOUND)
+            self.assertEqual(
+                self.auth_client.get(segment_url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_orjson_renderer_matches_drf_json_renderer(self):
+        """
+        Ensure the ORJSONRenderer produces the same bytes as DRF's JSONRenderer,
+        both for a serialized video and for raw datetimes and integer keys.
+        """
+        request = APIRequestFactory().get(self.detail_url)
+        video = Video.objects.get(pk=self.video1.pk)
+        payloads = [
+            VideoDetailSerializer(video, context={'request': request}).data,
+            {
+                'created_at': datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc),
+                'day': date(2024, 5, 1),
+                'counts': {1: 'one', 2: 'two'},
+            },
+        ]
+
+        for data in payloads:
+            self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
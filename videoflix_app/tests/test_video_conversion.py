@@ -1,23 +1,33 @@
 import os
-import tempfile
-from subprocess import CalledProcessError, TimeoutExpired
+import shutil
+from collections import Counter
+from subprocess import CalledProcessError, CompletedProcess, TimeoutExpired
 from unittest.mock import patch, MagicMock, call
-from django.test import TestCase, override_settings
-from django.core.files.uploadedfile import SimpleUploadedFile
+import pytest
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.conf import settings
-from django.db.models.signals import post_save
 
 from ..models import Video
-from ..tasks import generate_thumbnail, convert_video_to_hls, cleanup_files
-from .. import signals
+from ..tasks import generate_thumbnail, generate_thumbnails_batch, convert_video_to_hls, cleanup_files
+from .. import tasks
+from . import HLS_COMMANDS_PER_VIDEO, TempMediaRootMixin
 
 
-FAKE_VIDEO_CONTENT = b'GIF89a\x01\x00\x01\x00\x00\x00\x00\x00'
-TEMP_MEDIA_ROOT = tempfile.mkdtemp(prefix='videoflix_test_media_')
+FFPROBE_OUTPUT = (
+    '{"streams": [{"codec_type": "video", "codec_name": "h264", "width": 1920, "height": 1080},'
+    ' {"codec_type": "audio", "codec_name": "aac"}]}'
+)
+# What a successful ffprobe run returns; shared by all tests, which only read it.
+FFPROBE_RESULT = CompletedProcess(args=['ffprobe'], returncode=0, stdout=FFPROBE_OUTPUT)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
-class VideoConversionTasksTest(TestCase):
+def arg_pairs(command):
+    """Counts each option of an argv list together with the argument following it."""
+    return Counter(zip(command, command[1:]))
+
+
+@pytest.mark.mock
+class VideoConversionTasksTest(TempMediaRootMixin, TestCase):
     """
     Test suite for video conversion tasks.
     
@@ -30,85 +40,82 @@ class VideoConversionTasksTest(TestCase):
 
     def setUp(self):
         """Set up test video for conversion tests."""
-        # Disconnect signals to prevent Redis connection attempts during testing
-        post_save.disconnect(signals.video_post_save, sender=Video)
-        
-        fake_video_file = SimpleUploadedFile(
-            "test_video.mp4",
-            FAKE_VIDEO_CONTENT,
-            content_type="video/mp4"
-        )
+        # The tasks under test create their output directories in the media
+        # root; they are removed after each test, even if setUp fails.
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        # ffmpeg is mocked, so the video only needs a file name; assigning
+        # the name directly skips the upload and the storage write.
         self.video = Video.objects.create(
             title="Test Video",
             description="A test description",
             category="Testing",
-            video_file=fake_video_file
+            video_file='videos/test_video.mp4'
         )
 
-    def tearDown(self):
-        """Clean up temporary media directory and reconnect signals."""
-        # Reconnect signals after test
-        post_save.connect(signals.video_post_save, sender=Video)
-        
-        # More robust cleanup
-        self._cleanup_temp_directories()
-        
-    def _cleanup_temp_directories(self):
-        """Helper method to clean up all temporary test directories."""
-        import glob
-        import shutil
-        
-        # Cleanup the main temp directory
-        if os.path.exists(TEMP_MEDIA_ROOT):
-            shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
-        
-        # Cleanup any additional temp directories created during tests
-        temp_patterns = [
-            '/tmp/videoflix_test_*',
-            '/app/test_media',
-        ]
-        
-        for pattern in temp_patterns:
-            for temp_dir in glob.glob(pattern):
-                if os.path.exists(temp_dir):
-                    shutil.rmtree(temp_dir, ignore_errors=True)
+        # Every test runs against a mocked ffmpeg; by default it reports a
+        # 1080p source with AAC audio.
+        patcher = patch('videoflix_app.tasks.subprocess.run',
+                        return_value=FFPROBE_RESULT)
+        self.mock_subprocess = patcher.start()
+        self.addCleanup(patcher.stop)
 
-    @patch('videoflix_app.tasks.subprocess.run')
     @patch('videoflix_app.tasks.os.makedirs')
-    def test_generate_thumbnail_creates_correct_command(self, mock_makedirs, mock_subprocess):
+    def test_generate_thumbnail_creates_correct_command(self, mock_makedirs):
         """Test that thumbnail generation creates the correct ffmpeg command."""
-        mock_subprocess.return_value = MagicMock()
-        
         generate_thumbnail(self.video.pk)
         
         # Verify subprocess was called
-        self.assertTrue(mock_subprocess.called)
+        self.assertTrue(self.mock_subprocess.called)
         
         # Get the command that was executed
-        called_command = mock_subprocess.call_args[0][0]
-        command_str = ' '.join(called_command)
+        called_command = self.mock_subprocess.call_args[0][0]
+        pairs = arg_pairs(called_command)
         
         # Verify command contains expected ffmpeg parameters
-        self.assertIn('ffmpeg', command_str)
-        self.assertIn('-i', command_str)
-        self.assertIn('test_video.mp4', command_str)
-        self.assertIn('-ss 00:00:01.000', command_str)
-        self.assertIn('-vframes 1', command_str)
-        self.assertIn('.jpg', command_str)
+        self.assertEqual(called_command[0], tasks.FFMPEG)
+        self.assertTrue(called_command[-1].endswith('test_video.jpg'))
+        self.assertEqual(pairs[('-ss', '00:00:01.000')], 1)
+        self.assertEqual(pairs[('-vframes', '1')], 1)
+        # Paths are passed as single arguments, without shell quoting
+        self.assertEqual(pairs[('-i', self.video.video_file.path)], 1)
+        # Seeking happens on the input, before '-i'
+        self.assertLess(called_command.index('-ss'), called_command.index('-i'))
         
         # Verify directory creation was attempted
         mock_makedirs.assert_called()
 
-    @patch('videoflix_app.tasks.subprocess.run')
-    def test_generate_thumbnail_handles_video_not_found(self, mock_subprocess):
+    def test_generate_thumbnail_stores_thumbnail_path(self):
+        """Test that the thumbnail path is written with a single UPDATE."""
+        with patch.object(Video, 'save') as mock_save, self.assertNumQueries(2):
+            generate_thumbnail(self.video.pk)
+        
+        mock_save.assert_not_called()
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.thumbnail_url.name, os.path.join('thumbnails', 'test_video.jpg'))
+
+    def test_generate_thumbnails_batch_stores_all_thumbnails(self):
+        """Test that a batch renders every thumbnail and skips missing videos."""
+        other_video = Video.objects.create(
+            title="Other", description="d", category="Testing",
+            video_file='videos/other_video.mp4')
+        
+        generate_thumbnails_batch([self.video.pk, other_video.pk, 9999])
+        
+        self.assertEqual(self.mock_subprocess.call_count, 2)
+        self.video.refresh_from_db()
+        other_video.refresh_from_db()
+        self.assertEqual(self.video.thumbnail_url.name, os.path.join('thumbnails', 'test_video.jpg'))
+        self.assertEqual(other_video.thumbnail_url.name, os.path.join('thumbnails', 'other_video.jpg'))
+
+    def test_generate_thumbnail_handles_video_not_found(self):
         """Test thumbnail generation with non-existent video ID."""
         generate_thumbnail(9999)
         
         # Subprocess should not be called for non-existent video
-        mock_subprocess.assert_not_called()
+        self.mock_subprocess.assert_not_called()
 
-    @patch('videoflix_app.tasks.subprocess.run')
-    def test_generate_thumbnail_skips_if_thumbnail_exists(self, mock_subprocess):
+    def test_generate_thumbnail_skips_if_thumbnail_exists(self):
         """Test that thumbnail generation skips if thumbnail already exists."""
         # Set up video with existing thumbnail
         self.video.thumbnail_url.name = 'thumbnails/test_video.jpg'
@@ -117,192 +124,317 @@ class VideoConversionTasksTest(TestCase):
         generate_thumbnail(self.video.pk)
         
         # Subprocess should not be called if thumbnail exists
-        mock_subprocess.assert_not_called()
+        self.mock_subprocess.assert_not_called()
 
-    @patch('videoflix_app.tasks.subprocess.run')
-    def test_generate_thumbnail_handles_ffmpeg_error(self, mock_subprocess):
+    def test_generate_thumbnail_handles_ffmpeg_error(self):
         """Test thumbnail generation error handling."""
-        mock_subprocess.side_effect = CalledProcessError(1, 'ffmpeg', stderr='Error message')
+        self.mock_subprocess.side_effect = CalledProcessError(1, 'ffmpeg', stderr='Error message')
         
         # Should not raise exception
         generate_thumbnail(self.video.pk)
         
-        self.assertTrue(mock_subprocess.called)
+        self.assertTrue(self.mock_subprocess.called)
 
     @patch('videoflix_app.tasks.cleanup_files')
-    @patch('videoflix_app.tasks.subprocess.run')
-    @patch('videoflix_app.tasks.os.makedirs')
-    def test_convert_video_to_hls_creates_all_resolutions(self, mock_makedirs, mock_subprocess, mock_cleanup):
-        """Test that HLS conversion creates all required resolutions."""
-        mock_subprocess.return_value = MagicMock()
-        
+    def test_convert_video_to_hls_reuses_argv_template(self, mock_cleanup):
+        """Test that the ffmpeg arguments are built once and only the paths change."""
+        tasks._hls_argv_template.cache_clear()
+
         convert_video_to_hls(self.video.pk)
-        
-        # Should be called 6 times total: 3 for MP4 creation + 3 for HLS conversion
-        self.assertEqual(mock_subprocess.call_count, 6)
-        
-        # Check that all resolutions are processed
-        all_calls = [call.args[0] for call in mock_subprocess.call_args_list]
-        all_commands = [' '.join(cmd) for cmd in all_calls]
-        
-        # Verify MP4 creation commands
-        mp4_commands = all_commands[:3]
-        self.assertTrue(any('480p' in cmd for cmd in mp4_commands))
-        self.assertTrue(any('720p' in cmd for cmd in mp4_commands))
-        self.assertTrue(any('1080p' in cmd for cmd in mp4_commands))
-        
-        # Verify HLS conversion commands
-        hls_commands = all_commands[3:]
-        for cmd in hls_commands:
-            self.assertIn('-c:v copy', cmd)
-            self.assertIn('-c:a copy', cmd)
-            self.assertIn('-f hls', cmd)
-            self.assertIn('index.m3u8', cmd)
-
-    @patch('videoflix_app.tasks.subprocess.run')
-    def test_convert_video_to_hls_handles_video_not_found(self, mock_subprocess):
+        first_command = self.mock_subprocess.call_args.args[0]
+        self.video.video_file.name = 'videos/other_video.mp4'
+        self.video.save()
+        convert_video_to_hls(self.video.pk)
+        second_command = self.mock_subprocess.call_args.args[0]
+
+        info = tasks._hls_argv_template.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 1))
+        self.assertIn(os.path.join(settings.MEDIA_ROOT, 'videos', 'other_video.mp4'), second_command)
+        self.assertEqual(second_command[-1], os.path.join(
+            settings.MEDIA_ROOT, 'videos', 'other_video', '%v', 'index.m3u8'))
+        self.assertEqual(len(first_command), len(second_command))
+
+    def test_convert_video_to_hls_handles_video_not_found(self):
         """Test HLS conversion with non-existent video ID."""
         convert_video_to_hls(9999)
         
         # Subprocess should not be called for non-existent video
-        mock_subprocess.assert_not_called()
+        self.mock_subprocess.assert_not_called()
 
     @patch('videoflix_app.tasks.cleanup_files')
-    @patch('videoflix_app.tasks.subprocess.run')
-    def test_convert_video_to_hls_handles_mp4_creation_error(self, mock_subprocess, mock_cleanup):
-        """Test HLS conversion error handling during MP4 creation."""
-        mock_subprocess.side_effect = CalledProcessError(1, 'ffmpeg', stderr='Error creating MP4')
+    def test_convert_video_to_hls_keeps_original_on_error(self, mock_cleanup):
+        """Test that a failed HLS conversion keeps the original for a retry."""
+        self.mock_subprocess.side_effect = CalledProcessError(1, 'ffmpeg', stderr='Error encoding')
         
         convert_video_to_hls(self.video.pk)
         
-        # Should call cleanup after error
-        mock_cleanup.assert_called()
+        # The original upload must not be deleted after an error
+        mock_cleanup.assert_not_called()
 
-    @patch('videoflix_app.tasks.subprocess.run')
-    def test_convert_video_to_hls_command_structure(self, mock_subprocess):
-        """Test the structure of ffmpeg commands for HLS conversion."""
-        mock_subprocess.return_value = MagicMock()
+    def test_convert_video_to_hls_logs_end_of_ffmpeg_output(self):
+        """Test that ffmpeg's output goes to a file whose end is logged on error."""
+        def run(cmd_list, **kwargs):
+            if cmd_list[0].endswith('ffprobe'):
+                return FFPROBE_RESULT
+            kwargs['stderr'].write(b'frame=1\n' * 1000 + b'Conversion failed!')
+            raise CalledProcessError(1, 'ffmpeg')
+        self.mock_subprocess.side_effect = run
+        
+        with self.assertLogs('videoflix_app.tasks', level='ERROR') as logs:
+            convert_video_to_hls(self.video.pk)
         
+        self.assertIn('Conversion failed!', logs.output[0])
+        self.assertLess(len(logs.output[0]), 5000)
+
+    @override_settings(VIDEOFLIX_FFMPEG_VCODEC='h264_nvenc')
+    @patch('videoflix_app.tasks._available_encoders', return_value=frozenset({'h264_nvenc'}))
+    def test_convert_video_to_hls_uses_hardware_encoder(self, mock_encoders):
+        """Test that a configured and available hardware encoder replaces libx264."""
         convert_video_to_hls(self.video.pk)
         
-        # Get all command calls
-        all_calls = [call.args[0] for call in mock_subprocess.call_args_list]
-        
-        # Test MP4 creation commands (first 3 calls)
-        mp4_commands = all_calls[:3]
-        for i, cmd in enumerate(mp4_commands):
-            command_str = ' '.join(cmd)
-            self.assertIn('ffmpeg -i', command_str)
-            self.assertIn('-s', command_str)  # Scaling
-            self.assertIn('-c:v libx264', command_str)  # Video codec
-            self.assertIn('-crf 23', command_str)  # Quality
-            self.assertIn('-c:a aac', command_str)  # Audio codec
-        
-        # Test HLS conversion commands (last 3 calls)
-        hls_commands = all_calls[3:]
-        for cmd in hls_commands:
-            command_str = ' '.join(cmd)
-            self.assertIn('ffmpeg -i', command_str)
-            self.assertIn('-c:v copy -c:a copy', command_str)  # No re-encoding
-            self.assertIn('-hls_segment_filename', command_str)
-            self.assertIn('.ts', command_str)  # Segment files
-            self.assertIn('-hls_time 10', command_str)  # 10-second segments
-
-    @patch('videoflix_app.tasks.os.path.exists')
-    @patch('videoflix_app.tasks.os.remove')
-    def test_cleanup_files_removes_existing_files(self, mock_remove, mock_exists):
-        """Test that cleanup_files removes all existing files."""
-        mock_exists.return_value = True
+        command_str = ' '.join(self.mock_subprocess.call_args.args[0])
+        self.assertIn('-c:v h264_nvenc', command_str)
+        self.assertNotIn('libx264', command_str)
+
+    @override_settings(VIDEOFLIX_FFMPEG_VCODEC='auto')
+    @patch('videoflix_app.tasks.shutil.which', return_value='/usr/bin/nvidia-smi')
+    @patch('videoflix_app.tasks._available_encoders',
+           return_value=frozenset({'libx264', 'h264_nvenc', 'h264_vaapi'}))
+    def test_convert_video_to_hls_detects_nvidia_encoder(self, mock_encoders, mock_which):
+        """Test that 'auto' picks NVENC on a host with an NVIDIA driver."""
+        convert_video_to_hls(self.video.pk)
         
-        test_files = ['/path/to/file1.mp4', '/path/to/file2.mp4', '/path/to/file3.mp4']
-        cleanup_files(test_files)
+        mock_which.assert_called_with('nvidia-smi')
+        self.assertIn('-c:v h264_nvenc', ' '.join(self.mock_subprocess.call_args.args[0]))
+
+    @override_settings(VIDEOFLIX_FFMPEG_VCODEC='h264_vaapi')
+    @patch('videoflix_app.tasks._available_encoders', return_value=frozenset({'libx264'}))
+    def test_convert_video_to_hls_falls_back_to_libx264(self, mock_encoders):
+        """Test that libx264 is used if the configured encoder is unavailable."""
+        convert_video_to_hls(self.video.pk)
         
-        # Should check existence of all files
-        self.assertEqual(mock_exists.call_count, 3)
+        command_str = ' '.join(self.mock_subprocess.call_args.args[0])
+        self.assertIn('-c:v libx264', command_str)
+        self.assertNotIn('hwupload', command_str)
+
+    @patch('videoflix_app.tasks.FFMPEG', None)
+    def test_tasks_skip_without_ffmpeg(self):
+        """Test that the tasks return immediately if ffmpeg is not installed."""
+        generate_thumbnail(self.video.pk)
+        convert_video_to_hls(self.video.pk)
         
-        # Should remove all existing files
-        self.assertEqual(mock_remove.call_count, 3)
-        expected_calls = [call(f) for f in test_files]
-        mock_remove.assert_has_calls(expected_calls)
+        self.mock_subprocess.assert_not_called()
 
-    @patch('videoflix_app.tasks.os.path.exists')
-    @patch('videoflix_app.tasks.os.remove')
-    def test_cleanup_files_skips_non_existent_files(self, mock_remove, mock_exists):
-        """Test that cleanup_files skips non-existent files."""
-        mock_exists.return_value = False
+    @patch('videoflix_app.tasks.cleanup_files')
+    @patch('videoflix_app.tasks.os.makedirs')
+    def test_convert_video_to_hls_command_structure(self, mock_makedirs, mock_cleanup):
+        """Test that a single ffmpeg command creates all resolutions as HLS."""
+        convert_video_to_hls(self.video.pk)
+
+        # One ffprobe call, then a single ffmpeg call produces all resolutions
+        self.assertEqual(self.mock_subprocess.call_count, HLS_COMMANDS_PER_VIDEO)
+        command = self.mock_subprocess.call_args.args[0]
+        command_str = ' '.join(command)
+
+        with self.subTest('variants'):
+            stream_map = command[command.index('-var_stream_map') + 1]
+            self.assertEqual(
+                stream_map, 'v:0,a:0,name:480p v:1,a:1,name:720p v:2,a:2,name:1080p')
+            self.assertEqual(command[-1], os.path.join(
+                settings.MEDIA_ROOT, 'videos', 'test_video', '%v', 'index.m3u8'))
+            self.assertIn('master.m3u8', command)
+            self.assertEqual(command_str.count('-f hls'), 1)
+            # No intermediate MP4 files are written
+            self.assertNotIn('_480p.mp4', command_str)
+
+        with self.subTest('input'):
+            # The MP4 header describes the streams, so the input is barely probed
+            self.assertIn('ffmpeg -probesize 32 -analyzeduration 0 -fpsprobesize 0 -i', command_str)
+
+        with self.subTest('scaling'):
+            # One decode, each resolution scaled from the next larger one
+            self.assertIn('[0:v]scale=1920:1080,split=2[v1080p][n0]', command_str)
+            self.assertIn('[n0]scale=1280:720,split=2[v720p][n1]', command_str)
+            self.assertIn('[n1]scale=854:480[v480p]', command_str)
+
+        with self.subTest('encoding'):
+            pairs = arg_pairs(command)
+            self.assertEqual(pairs[('-c:v', 'libx264')], 1)  # Video codec
+            self.assertEqual(pairs[('-crf', '23')], 1)  # Quality
+            self.assertEqual(pairs[('-c:a', 'copy')], 1)  # AAC source audio is copied
+            self.assertEqual(pairs[('-map', '0:a:0')], 3)  # Audio for every variant
+            self.assertEqual(pairs[('-hls_segment_filename', os.path.join(
+                settings.MEDIA_ROOT, 'videos', 'test_video', '%v', '%03d.ts'))], 1)  # Segment files
+            self.assertEqual(pairs[('-hls_time', '10')], 1)  # 10-second segments
+            self.assertEqual(pairs[('-threads', str(settings.VIDEOFLIX_FFMPEG_THREADS))], 1)
+            self.assertEqual(pairs[('-loglevel', 'error')], 1)  # No progress output
+
+    @patch('videoflix_app.tasks.cleanup_files')
+    def test_convert_video_to_hls_skips_upscales(self, mock_cleanup):
+        """Test that a 720p source is not upscaled to 1080p."""
+        self.mock_subprocess.return_value = MagicMock(
+            stdout='{"streams": [{"codec_type": "video", "codec_name": "h264", "width": 1280, "height": 720}]}')
         
-        test_files = ['/path/to/nonexistent1.mp4', '/path/to/nonexistent2.mp4']
-        cleanup_files(test_files)
+        convert_video_to_hls(self.video.pk)
         
-        # Should check existence but not try to remove
-        self.assertEqual(mock_exists.call_count, 2)
-        mock_remove.assert_not_called()
+        command = self.mock_subprocess.call_args.args[0]
+        self.assertNotIn('scale=1920:1080', ' '.join(command))
+        stream_map = command[command.index('-var_stream_map') + 1]
+        self.assertEqual(stream_map, 'v:0,name:480p v:1,name:720p')
+        # The 1080p URL is served from the 720p rendition
+        link = os.path.join(settings.MEDIA_ROOT, 'videos', 'test_video', '1080p')
+        self.assertEqual(os.readlink(link), '720p')
 
-    @patch('videoflix_app.tasks.os.path.exists')
-    @patch('videoflix_app.tasks.os.remove')
-    def test_cleanup_files_handles_removal_error(self, mock_remove, mock_exists):
-        """Test that cleanup_files handles OS errors gracefully."""
-        mock_exists.return_value = True
-        mock_remove.side_effect = OSError("Permission denied")
+    def _write_playlist(self, resolution, content):
+        """Writes an HLS playlist for the test video."""
+        playlist_dir = os.path.join(settings.MEDIA_ROOT, 'videos', 'test_video', resolution)
+        os.makedirs(playlist_dir, exist_ok=True)
+        with open(os.path.join(playlist_dir, 'index.m3u8'), 'w') as playlist:
+            playlist.write(content)
+
+    def _set_thumbnail(self):
+        """Stores a thumbnail for the test video, as the thumbnail job would."""
+        Video.objects.filter(pk=self.video.pk).update(thumbnail_url='thumbnails/test_video.jpg')
+
+    @patch('videoflix_app.tasks.cleanup_files')
+    def test_convert_video_to_hls_keeps_original_without_thumbnail(self, mock_cleanup):
+        """Test that the original is kept while the video has no thumbnail."""
+        with self.assertLogs('videoflix_app.tasks', level='WARNING'):
+            convert_video_to_hls(self.video.pk)
+
+        self.assertEqual(self.mock_subprocess.call_count, HLS_COMMANDS_PER_VIDEO)
+        mock_cleanup.assert_not_called()
+
+    @patch('videoflix_app.tasks.cleanup_files')
+    def test_convert_video_to_hls_resumes_unfinished_renditions(self, mock_cleanup):
+        """Test that a re-run only encodes renditions without a complete playlist."""
+        self._set_thumbnail()
+        self._write_playlist('480p', '#EXTM3U\n#EXTINF:10.0,\n000.ts\n#EXT-X-ENDLIST\n')
+        self._write_playlist('720p', '#EXTM3U\n#EXTINF:10.0,\n000.ts\n')
         
-        test_files = ['/path/to/protected_file.mp4']
+        convert_video_to_hls(self.video.pk)
         
-        # Should not raise exception
-        cleanup_files(test_files)
+        command = self.mock_subprocess.call_args.args[0]
+        stream_map = command[command.index('-var_stream_map') + 1]
+        self.assertEqual(stream_map, 'v:0,a:0,name:720p v:1,a:1,name:1080p')
+        self.assertNotIn('-master_pl_name', command)
+        mock_cleanup.assert_called_once()
+
+    @patch('videoflix_app.tasks.cleanup_files')
+    def test_convert_video_to_hls_skips_finished_video(self, mock_cleanup):
+        """
+        Test that nothing is encoded if every rendition is complete, and that
+        the source is not probed, since it may already have been removed.
+        """
+        self._set_thumbnail()
+        for resolution in ('480p', '720p', '1080p'):
+            self._write_playlist(resolution, '#EXTM3U\n#EXT-X-ENDLIST\n')
+        self.mock_subprocess.side_effect = CalledProcessError(1, 'ffprobe', stderr='No such file')
         
-        mock_remove.assert_called_once_with('/path/to/protected_file.mp4')
+        convert_video_to_hls(self.video.pk)
+        
+        self.mock_subprocess.assert_not_called()
+        mock_cleanup.assert_called_once_with([self.video.video_file.path])
 
-    def test_video_conversion_integration(self):
-        """Integration test for the complete video conversion workflow."""
-        with patch('videoflix_app.tasks.subprocess.run') as mock_subprocess, \
-             patch('videoflix_app.tasks.os.makedirs') as mock_makedirs:
-            
-            mock_subprocess.return_value = MagicMock()
-            
-            # Test thumbnail generation
-            generate_thumbnail(self.video.pk)
-            
-            # Test HLS conversion
-            convert_video_to_hls(self.video.pk)
-            
-            # Verify total subprocess calls (1 for thumbnail + 6 for HLS)
-            self.assertEqual(mock_subprocess.call_count, 7)
-            
-            # Verify directory creation was called
-            self.assertTrue(mock_makedirs.called)
-
-    @patch('videoflix_app.tasks.subprocess.run')
-    def test_hls_conversion_resolution_dimensions(self, mock_subprocess):
-        """Test that HLS conversion uses correct dimensions for each resolution."""
-        mock_subprocess.return_value = MagicMock()
+    def test_convert_video_to_hls_without_audio(self):
+        """Test that a source without an audio stream maps video only."""
+        self.mock_subprocess.return_value = MagicMock(
+            stdout='{"streams": [{"codec_type": "video", "codec_name": "h264"}]}')
         
         convert_video_to_hls(self.video.pk)
         
-        # Get MP4 creation commands (first 3 calls)
-        mp4_commands = [' '.join(call.args[0]) for call in mock_subprocess.call_args_list[:3]]
-        
-        # Check that correct dimensions are used
-        dimensions_found = []
-        for cmd in mp4_commands:
-            if '854x480' in cmd:
-                dimensions_found.append('480p')
-            elif '1280x720' in cmd:
-                dimensions_found.append('720p')
-            elif '1920x1080' in cmd:
-                dimensions_found.append('1080p')
-        
-        self.assertEqual(len(dimensions_found), 3)
-        self.assertIn('480p', dimensions_found)
-        self.assertIn('720p', dimensions_found)
-        self.assertIn('1080p', dimensions_found)
-
-    @patch('videoflix_app.tasks.subprocess.run')
-    def test_hls_conversion_timeout_handling(self, mock_subprocess):
+        command = self.mock_subprocess.call_args.args[0]
+        self.assertNotIn('0:a:0', command)
+        stream_map = command[command.index('-var_stream_map') + 1]
+        self.assertEqual(stream_map, 'v:0,name:480p v:1,name:720p v:2,name:1080p')
+
+    def test_convert_video_to_hls_encodes_non_aac_audio(self):
+        """Test that audio which is not AAC is encoded to AAC."""
+        self.mock_subprocess.return_value = MagicMock(stdout=(
+            '{"streams": [{"codec_type": "video", "codec_name": "h264"},'
+            ' {"codec_type": "audio", "codec_name": "mp3"}]}'))
+        
+        convert_video_to_hls(self.video.pk)
+        
+        command_str = ' '.join(self.mock_subprocess.call_args.args[0])
+        self.assertIn('-c:a aac', command_str)
+        self.assertNotIn('-c:a copy', command_str)
+
+    @patch('videoflix_app.tasks.cleanup_files')
+    def test_convert_video_to_hls_aborts_if_probe_fails(self, mock_cleanup):
+        """Test that no encode is started when ffprobe cannot read the source."""
+        self.mock_subprocess.side_effect = CalledProcessError(1, 'ffprobe', stderr='Invalid data')
+        
+        convert_video_to_hls(self.video.pk)
+        
+        self.assertEqual(self.mock_subprocess.call_count, 1)
+        self.assertTrue(self.mock_subprocess.call_args.args[0][0].endswith('ffprobe'))
+        mock_cleanup.assert_not_called()
+
+    @patch('videoflix_app.tasks.cleanup_files')
+    @patch('videoflix_app.tasks.os.makedirs')
+    def test_tasks_run_expected_number_of_commands(self, mock_makedirs, mock_cleanup):
+        """Test how many external commands each task runs for one video."""
+        # The thumbnail needs one ffmpeg call; HLS needs ffprobe plus one ffmpeg call.
+        for task, expected_calls in ((generate_thumbnail, 1),
+                                     (convert_video_to_hls, HLS_COMMANDS_PER_VIDEO)):
+            with self.subTest(task=task.__name__):
+                self.mock_subprocess.reset_mock()
+                mock_makedirs.reset_mock()
+
+                task(self.video.pk)
+
+                self.assertEqual(self.mock_subprocess.call_count, expected_calls)
+                mock_makedirs.assert_called()
+
+    def test_hls_conversion_timeout_handling(self):
         """Test that HLS conversion handles timeouts properly."""
-        mock_subprocess.side_effect = TimeoutExpired('ffmpeg', 900)
+        self.mock_subprocess.side_effect = TimeoutExpired('ffmpeg', 900)
         
         # Should not raise exception
         convert_video_to_hls(self.video.pk)
         
         # Should have attempted the first subprocess call
-        self.assertTrue(mock_subprocess.called)
+        self.assertTrue(self.mock_subprocess.called)
+
+
+class CleanupFilesTest(SimpleTestCase):
+    """
+    Tests for the cleanup_files helper.
+
+    The filesystem calls are mocked and no database access is needed, so
+    the tests run without a transaction around each of them.
+    """
+
+    @patch('videoflix_app.tasks.os.remove')
+    def test_cleanup_files_removes_existing_files(self, mock_remove):
+        """Test that cleanup_files removes all existing files."""
+        test_files = ['/path/to/file1.mp4', '/path/to/file2.mp4', '/path/to/file3.mp4']
+        cleanup_files(test_files)
+        
+        # Should remove all files, in order, without checking for them first
+        self.assertEqual(mock_remove.call_args_list, [call(f) for f in test_files])
+
+    @patch('videoflix_app.tasks.os.remove', side_effect=FileNotFoundError)
+    def test_cleanup_files_skips_non_existent_files(self, mock_remove):
+        """Test that cleanup_files skips non-existent files."""
+        test_files = ['/path/to/nonexistent1.mp4', '/path/to/nonexistent2.mp4']
+        
+        # Should not raise exception
+        with self.assertNoLogs('videoflix_app.tasks', level='ERROR'):
+            cleanup_files(test_files)
+        
+        self.assertEqual(mock_remove.call_count, 2)
+
+    @patch('videoflix_app.tasks.os.remove')
+    def test_cleanup_files_handles_removal_error(self, mock_remove):
+        """Test that cleanup_files handles OS errors gracefully."""
+        mock_remove.side_effect = OSError("Permission denied")
+        
+        test_files = ['/path/to/protected_file.mp4']
+        
+        # Should not raise exception
+        with self.assertLogs('videoflix_app.tasks', level='ERROR'):
+            cleanup_files(test_files)
+        
+        mock_remove.assert_called_once_with('/path/to/protected_file.mp4')